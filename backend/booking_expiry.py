@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import threading
+import traceback
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+import backend.state_cache as state_cache
+from backend.database import SessionLocal
+from backend.models import GMT7, get_now_gmt7
+
+# ================================
+# BOOKING EXPIRY SCHEDULER
+# ================================
+# Min-heap berisi (qr_expires_at, id_booking) untuk booking pending.
+# Background task (dijalankan dari lifespan FastAPI) membatalkan booking yang
+# lewat batas waktu per batch dan melepas slot-nya, tanpa scan tabel booking.
+
+EXPIRY_TICK_SECONDS = 5
+EXPIRY_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_heap: list[tuple[datetime, int]] = []
+
+
+def _naive_gmt7(value: datetime) -> datetime:
+    # MySQL menyimpan datetime tanpa timezone (dianggap GMT+7)
+    if value.tzinfo is not None:
+        value = value.astimezone(GMT7).replace(tzinfo=None)
+    return value
+
+
+def schedule(id_booking: int, expires_at: datetime) -> None:
+    """Register the QR deadline of a pending booking"""
+    with _lock:
+        heapq.heappush(_heap, (_naive_gmt7(expires_at), id_booking))
+
+
+async def load_pending(db: AsyncSession) -> int:
+    """Rebuild the heap from all pending bookings (once, at startup)"""
+    rows = (await db.execute(
+        select(models.Booking.id_booking, models.Booking.qr_expires_at).where(
+            models.Booking.status == "pending",
+            models.Booking.qr_expires_at.isnot(None)
+        )
+    )).all()
+
+    with _lock:
+        _heap.clear()
+        _heap.extend((_naive_gmt7(expires_at), id_booking) for id_booking, expires_at in rows)
+        heapq.heapify(_heap)
+    return len(rows)
+
+
+def has_due() -> bool:
+    with _lock:
+        return bool(_heap) and _heap[0][0] <= _naive_gmt7(get_now_gmt7())
+
+
+def _pop_due(now: datetime) -> list[tuple[datetime, int]]:
+    due = []
+    with _lock:
+        while _heap and _heap[0][0] <= now and len(due) < EXPIRY_BATCH_SIZE:
+            due.append(heapq.heappop(_heap))
+    return due
+
+
+def _push_back(entries: list[tuple[datetime, int]]) -> None:
+    with _lock:
+        for entry in entries:
+            heapq.heappush(_heap, entry)
+
+
+async def expire_due(db: AsyncSession) -> int:
+    """Cancel one batch of expired pending bookings and release their slots"""
+    now = _naive_gmt7(get_now_gmt7())
+    due = _pop_due(now)
+    if not due:
+        return 0
+    try:
+        booking_ids, slot_ids = await _cancel(db, [id_booking for _, id_booking in due], now)
+    except BaseException:
+        # Query / commit gagal (deadlock, koneksi putus): coba lagi di tick berikutnya
+        _push_back(due)
+        raise
+    if not booking_ids:
+        return 0
+
+    for id_slot in slot_ids:
+        state_cache.set_slot(id_slot, booked=False)
+
+    print(f"(Expiry) Cancelled {len(booking_ids)} expired booking(s):", booking_ids)
+    return len(booking_ids)
+
+
+async def _cancel(db: AsyncSession, due: list[int], now: datetime) -> tuple[list[int], set[int]]:
+    # Booking yang sudah check-in / dibatalkan / diperpanjang di antaranya dilewati
+    expired = (await db.execute(
+        select(models.Booking.id_booking, models.Booking.id_parkir).where(
+            models.Booking.id_booking.in_(due),
+            models.Booking.status == "pending",
+            models.Booking.qr_expires_at <= now
+        ).with_for_update()
+    )).all()
+
+    if not expired:
+        await db.rollback()
+        return [], set()
+
+    booking_ids = [id_booking for id_booking, _ in expired]
+    slot_ids = {id_parkir for _, id_parkir in expired if id_parkir is not None}
+
+    await db.execute(
+        update(models.Booking)
+        .where(models.Booking.id_booking.in_(booking_ids))
+        .values(status="cancelled")
+        .execution_options(synchronize_session=False)
+    )
+
+    if slot_ids:
+        await db.execute(
+            update(models.Slot)
+            .where(models.Slot.id_slot.in_(slot_ids))
+            .values(booked=False)
+            .execution_options(synchronize_session=False)
+        )
+
+    await db.commit()
+    return booking_ids, slot_ids
+
+
+async def _run_once(initial: bool) -> int:
+    async with SessionLocal() as db:
+        if initial:
+            await load_pending(db)
+        return await expire_due(db)
+
+
+async def run() -> None:
+    """Background loop, started from the FastAPI lifespan"""
+    loaded = False
+    while True:
+        try:
+            await _run_once(not loaded)
+            loaded = True
+            # Masih ada sisa batch -> lanjut tanpa menunggu tick berikutnya
+            if has_due():
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error in booking expiry: {str(e)}")
+            print(traceback.format_exc())
+        await asyncio.sleep(EXPIRY_TICK_SECONDS)
@@ -1,25 +1,239 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+import threading
+import time
+from typing import Optional
 
-DB_USER = "web"
-DB_PASSWORD = ""     # atau password MySQL kamu
-DB_HOST = "127.0.0.1"
-DB_NAME = "fastapi_db"
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+from backend.cache import TTLCache
 
-engine = create_engine(DATABASE_URL)
+DB_USER = os.getenv("DB_USER", "web")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")     # atau password MySQL kamu
+DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
+DB_NAME = os.getenv("DB_NAME", "fastapi_db")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Driver async: aiomysql (produksi), aiosqlite bisa dipakai untuk testing
+DATABASE_URL = os.getenv("DATABASE_URL", f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+
+# Read replica (opsional). Tanpa DATABASE_REPLICA_URL semua baca ke primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# Setelah client menulis, bacaannya diarahkan ke primary selama jendela ini (read-your-writes)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+
+# ===============================
+# Connection pool
+# ===============================
+# Backend berjalan sebagai satu proses (lihat acquire_instance_lock), jadi
+# total koneksi maksimal ke MySQL = DB_POOL_SIZE + DB_MAX_OVERFLOW (satu dipegang lock)
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))   # < wait_timeout MySQL
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a free connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite (testing) memakai pool bawaan dialect
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+if DATABASE_REPLICA_URL:
+    read_engine = create_async_engine(DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL))
+else:
+    read_engine = engine
+
+
+class PrimarySession(Session):
+    """Session on the primary; remembers whether it committed (see get_db)"""
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_commit(session):
+    session.info["committed"] = True
+
+
+# expire_on_commit=False: atribut tetap bisa dibaca setelah commit tanpa query (lazy IO tidak didukung async)
+SessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, sync_session_class=PrimarySession,
+    autoflush=False, expire_on_commit=False
+)
+ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def pool_status(db_engine=None) -> dict:
+    """Snapshot of connection pool usage for /metrics/db-pool"""
+    pool = (db_engine or engine).sync_engine.pool
+    status = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "timeout_seconds": pool.timeout(),
+        })
+        capacity = status["size"] + max(0, status["max_overflow"])
+        status["utilization"] = round(status["checked_out"] / capacity, 3) if capacity else 0.0
+    if isinstance(pool, TimedQueuePool):
+        with pool.stats_lock:
+            status.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                "wait_max_ms": round(pool.wait_max * 1000, 3),
+            })
+    return status
 
 Base = declarative_base()
 
 # ===============================
 # FastAPI dependency (untuk Depends())
 # ===============================
-def get_db():
-    db = SessionLocal()
-    try:
+_recent_writers = TTLCache(maxsize=10000, ttl=DB_READ_YOUR_WRITES_SECONDS)
+
+def _client_key(request: Request) -> str:
+    # Token login bila ada, selain itu alamat client (ESP32 / endpoint /db tanpa auth)
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else ""
+
+async def get_db(request: Request):
+    """Session on the primary (all writes)"""
+    async with SessionLocal() as db:
+        try:
+            yield db
+        finally:
+            if db.sync_session.info.get("committed"):
+                _recent_writers.set(_client_key(request), True)
+
+async def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: the replica, or the primary when the
+    same client committed a write in the last DB_READ_YOUR_WRITES_SECONDS.
+    Do not use it for reads that feed state_cache or a following write.
+    """
+    if read_engine is engine or _recent_writers.get(_client_key(request)):
+        session_factory = SessionLocal
+    else:
+        session_factory = ReadSessionLocal
+    async with session_factory() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def replica_lag_seconds() -> Optional[float]:
+    """Replication delay reported by the replica (None when unknown)"""
+    if read_engine is engine:
+        return 0.0
+    async with read_engine.connect() as connection:
+        if connection.dialect.name != "mysql":
+            return None
+        try:
+            row = (await connection.exec_driver_sql("SHOW REPLICA STATUS")).mappings().first()
+        except DBAPIError:
+            # MySQL < 8.0.22
+            row = (await connection.exec_driver_sql("SHOW SLAVE STATUS")).mappings().first()
+    if not row:
+        return None
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return float(lag) if lag is not None else None
+
+# ===============================
+# Satu proses backend
+# ===============================
+# state_cache, antrian gate_commands, waiter long-poll / subscriber SSE dan
+# cache idempotency disimpan in-process: worker atau instance kedua akan
+# melayani state basi. Lock bernama MySQL ini dipegang selama proses hidup
+# sehingga proses kedua gagal start.
+INSTANCE_LOCK_NAME = "parkingly-backend"
+INSTANCE_LOCK_TIMEOUT_SECONDS = 10   # beri waktu proses lama berhenti saat restart
+
+async def acquire_instance_lock():
+    """Hold the backend instance lock; returns the connection holding it (None on SQLite)"""
+    if engine.dialect.name != "mysql":
+        return None
+    connection = await engine.connect()
+    try:
+        # Koneksi idle tidak boleh diputus wait_timeout, karena lock ikut lepas
+        await connection.exec_driver_sql("SET SESSION wait_timeout = 31536000")
+        acquired = await connection.scalar(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": INSTANCE_LOCK_NAME, "timeout": INSTANCE_LOCK_TIMEOUT_SECONDS}
+        )
+    except BaseException:
+        await connection.close()
+        raise
+    if acquired != 1:
+        await connection.close()
+        raise RuntimeError(
+            "Another backend process is already running on this database; "
+            "run a single uvicorn worker (no --workers > 1)"
+        )
+    return connection
+
+# ===============================
+# Migrasi skema (Alembic)
+# ===============================
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+def _upgrade(connection):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.attributes["skip_logging"] = True
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+async def run_migrations():
+    """Upgrade the database schema to the latest migration (`alembic upgrade head`)"""
+    async with engine.begin() as connection:
+        await connection.run_sync(_upgrade)
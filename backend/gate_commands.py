@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+import backend.state_cache as state_cache
+from backend.models import GMT7, get_now_gmt7
+
+# ================================
+# GATE COMMAND QUEUE
+# ================================
+# Setiap "buka gate" adalah satu baris gate_command dengan nomor urut
+# (id_command). Semua perintah yang belum di-ack dikirim ke ESP32 di setiap
+# /hw/instruction; ESP32 mencatat seq yang sudah dieksekusi (bukan hanya seq
+# tertinggi), jadi perintah yang commit-nya lebih lambat dari seq sesudahnya
+# tetap dieksekusi sekali, lalu di-ack lewat /hw/update-gate.
+# Dua mobil berurutan = dua perintah, tidak lagi satu flag.
+# Seperti state_cache: enqueue() di dalam transaksi, publish()/acked()
+# dipanggil SETELAH commit berhasil. Antrian ini in-process, jadi backend
+# wajib berjalan dengan satu worker (lihat backend/README.md).
+
+OPEN = "open"
+# Perintah yang tidak di-ack selama ini dianggap basi (gate tidak dibuka belakangan)
+COMMAND_TTL_SECONDS = 120
+LATENCY_SAMPLES = 1000
+
+
+@dataclass(frozen=True)
+class PendingCommand:
+    seq: int
+    id_aktuator: int
+    perintah: str
+    dibuat: datetime  # GMT+7 tanpa timezone (sama seperti kolom DateTime)
+
+
+_lock = threading.Lock()
+_pending: Optional[OrderedDict[int, PendingCommand]] = None
+_loaded = False
+_latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+_acked_total = 0
+_expired_total = 0
+
+
+def _naive_gmt7(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(GMT7).replace(tzinfo=None)
+    return value
+
+
+def _pending_from_row(command: models.GateCommand) -> PendingCommand:
+    return PendingCommand(
+        seq=command.id_command,
+        id_aktuator=command.id_aktuator,
+        perintah=command.perintah,
+        dibuat=_naive_gmt7(command.dibuat),
+    )
+
+
+async def enqueue(db: AsyncSession, id_aktuator: int, perintah: str = OPEN) -> models.GateCommand:
+    """Add a command to the caller's transaction (flushed, so its seq is known)"""
+    command = models.GateCommand(id_aktuator=id_aktuator, perintah=perintah, dibuat=get_now_gmt7())
+    db.add(command)
+    await db.flush()
+    return command
+
+
+def publish(command: models.GateCommand) -> None:
+    """Make a committed command visible to /hw/instruction"""
+    global _pending
+    with _lock:
+        if _pending is None:
+            _pending = OrderedDict()
+        seq = command.id_command
+        out_of_order = bool(_pending) and seq < next(reversed(_pending))
+        _pending[seq] = _pending_from_row(command)
+        if out_of_order:
+            # Transaksi dengan seq lebih kecil bisa commit belakangan: jaga urutan seq
+            _pending = OrderedDict(sorted(_pending.items()))
+    state_cache.bump_version()
+
+
+async def _load(db: AsyncSession) -> None:
+    global _pending, _loaded
+    cutoff = _naive_gmt7(get_now_gmt7()) - timedelta(seconds=COMMAND_TTL_SECONDS)
+    rows = (await db.scalars(
+        select(models.GateCommand)
+        .where(models.GateCommand.diakui.is_(None), models.GateCommand.dibuat >= cutoff)
+        .order_by(models.GateCommand.id_command)
+    )).all()
+    with _lock:
+        # Gabungkan dengan perintah yang di-publish selama query berjalan
+        merged = {command.id_command: _pending_from_row(command) for command in rows}
+        merged.update(_pending or {})
+        _pending = OrderedDict(sorted(merged.items()))
+        _loaded = True
+
+
+async def get_pending(db: AsyncSession) -> list[PendingCommand]:
+    """All unacknowledged commands, oldest seq first (loaded once from the DB)"""
+    global _expired_total
+    if not _loaded:
+        await _load(db)
+
+    cutoff = _naive_gmt7(get_now_gmt7()) - timedelta(seconds=COMMAND_TTL_SECONDS)
+    with _lock:
+        while _pending:
+            oldest = next(iter(_pending.values()))
+            if oldest.dibuat >= cutoff:
+                break
+            _pending.popitem(last=False)
+            _expired_total += 1
+        # Umumnya kosong / hanya beberapa perintah sampai ESP32 meng-ack
+        return list(_pending.values()) if _pending else []
+
+
+async def acknowledge(db: AsyncSession, seqs: Iterable[int]) -> None:
+    """Mark commands as acknowledged inside the caller's transaction"""
+    seqs = list(seqs)
+    if not seqs:
+        return
+    await db.execute(
+        update(models.GateCommand)
+        .where(models.GateCommand.id_command.in_(seqs), models.GateCommand.diakui.is_(None))
+        .values(diakui=get_now_gmt7())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def acked(seqs: Iterable[int]) -> None:
+    """Drop committed acks from the queue and record open-to-ack latency"""
+    global _acked_total
+    now = _naive_gmt7(get_now_gmt7())
+    with _lock:
+        for seq in seqs:
+            command = _pending.pop(seq, None) if _pending else None
+            if command is None:
+                continue
+            _acked_total += 1
+            _latencies.append((now - command.dibuat).total_seconds() * 1000)
+
+
+def stats() -> dict:
+    """Queue size and open-to-ack latency (ms) over the last LATENCY_SAMPLES acks of this worker"""
+    with _lock:
+        samples = sorted(_latencies)
+        pending = len(_pending) if _pending else 0
+        acked_total = _acked_total
+        expired_total = _expired_total
+
+    def percentile(p: float) -> Optional[float]:
+        if not samples:
+            return None
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1)
+
+    return {
+        "pending": pending,
+        "acked": acked_total,
+        "expired": expired_total,
+        "latency_ms": {
+            "samples": len(samples),
+            "avg": round(sum(samples) / len(samples), 1) if samples else None,
+            "p50": percentile(0.50),
+            "p99": percentile(0.99),
+            "max": round(samples[-1], 1) if samples else None,
+        },
+    }
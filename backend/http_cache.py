@@ -0,0 +1,23 @@
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+# ================================
+# ETag untuk response JSON kecil
+# ================================
+# ETag = hash isi payload, jadi sama di semua worker. Client mengirim
+# If-None-Match dan mendapat 304 tanpa body bila tidak ada perubahan.
+
+
+def json_with_etag(request: Request, payload: dict) -> Response:
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+    # no-cache: boleh disimpan browser, tapi wajib revalidasi (If-None-Match) tiap kali
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=JSONResponse.media_type, headers=headers)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+from backend.cache import TTLCache
+from backend.database import PrimarySession, get_db
+from backend.models import get_now_gmt7
+from backend.security import Principal, get_principal
+
+# ================================
+# IDEMPOTENCY-KEY
+# ================================
+# Response sukses pertama untuk sebuah Idempotency-Key disimpan di tabel
+# idempotency_key dalam transaksi yang sama dengan efeknya, lalu di LRU
+# in-process setelah commit. Retry dengan key yang sama langsung mendapat
+# response tersebut (header Idempotency-Replayed) tanpa menjalankan handler.
+# Key di-scope per principal dan path, jadi key yang sama dari user lain tidak bentrok.
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+PURGE_INTERVAL_SECONDS = 60 * 60
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotency-Replayed"
+
+_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS)
+_lock = threading.Lock()
+_in_flight: set[str] = set()
+_last_purge = 0.0
+
+
+class IdempotencyKey:
+    def __init__(self, kunci: Optional[str] = None, response: Optional[JSONResponse] = None):
+        self.kunci = kunci
+        # Diisi bila key sudah pernah dipakai: handler cukup mengembalikan ini
+        self.response = response
+
+    async def save(self, db: AsyncSession, payload: Any, status_code: int = 200) -> Any:
+        """Store the response in the caller's transaction (call before db.commit())"""
+        if self.kunci:
+            await store(db, self.kunci, payload, status_code)
+        return payload
+
+
+def make_key(principal: Principal, path: str, key: str) -> str:
+    """Stored key of `key` for one principal and path"""
+    return hashlib.sha256(f"{principal.role}:{principal.id}:{path}:{key}".encode()).hexdigest()
+
+
+async def lookup(db: AsyncSession, kunci: str) -> Optional[tuple[int, Any]]:
+    """(status_code, body) stored for a key: LRU first, then one primary-key lookup"""
+    stored = _cache.get(kunci)
+    if stored is not None:
+        return stored
+    row = await db.get(models.IdempotencyKey, kunci)
+    if row is None:
+        return None
+    if row.dibuat is None or row.dibuat < _cutoff():
+        # Lewat TTL tapi belum di-purge: diganti oleh store() di transaksi ini
+        await db.delete(row)
+        return None
+    stored = (row.status_code, json.loads(row.response))
+    _cache.set(kunci, stored)
+    return stored
+
+
+async def store(db: AsyncSession, kunci: str, payload: Any, status_code: int = 200) -> None:
+    """Add the response of a key to the caller's transaction; cached once it commits"""
+    body = jsonable_encoder(payload)
+    db.add(models.IdempotencyKey(
+        kunci=kunci,
+        status_code=status_code,
+        response=json.dumps(body, separators=(",", ":"))
+    ))
+    await _purge_if_due(db)
+    # Masuk cache hanya setelah commit berhasil (lihat _cache_on_commit)
+    db.sync_session.info.setdefault("idempotency", []).append((kunci, (status_code, body)))
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _cache_on_commit(session):
+    for kunci, stored in session.info.pop("idempotency", []):
+        _cache.set(kunci, stored)
+
+
+@event.listens_for(PrimarySession, "after_soft_rollback")
+def _forget_on_rollback(session, previous_transaction):
+    # Rollback savepoint (begin_nested, mis. satu item scan batch yang gagal)
+    # tidak membatalkan key yang disimpan item sebelumnya di transaksi luar
+    if previous_transaction.nested:
+        return
+    session.info.pop("idempotency", None)
+
+
+async def _purge_if_due(db: AsyncSession) -> None:
+    # Hapus key lewat TTL paling sering sekali per jam, menumpang transaksi yang sedang berjalan
+    global _last_purge
+    now = time.monotonic()
+    with _lock:
+        if now - _last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = now
+    await db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.dibuat < _cutoff()))
+
+
+def _cutoff():
+    # Kolom DateTime disimpan tanpa timezone (GMT+7)
+    return (get_now_gmt7() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)).replace(tzinfo=None)
+
+
+def _replay(stored: tuple[int, Any]) -> JSONResponse:
+    status_code, body = stored
+    return JSONResponse(body, status_code=status_code, headers={REPLAYED_HEADER: "true"})
+
+
+async def idempotency_key(
+    request: Request,
+    key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Dependency: look up the Idempotency-Key header (LRU first, then one PK lookup)"""
+    if not key:
+        yield IdempotencyKey()
+        return
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key maksimal {MAX_KEY_LENGTH} karakter")
+
+    kunci = make_key(principal, request.url.path, key)
+    stored = await lookup(db, kunci)
+    if stored is not None:
+        yield IdempotencyKey(kunci, _replay(stored))
+        return
+
+    # Retry yang datang saat request pertama masih berjalan (worker yang sama)
+    with _lock:
+        if kunci in _in_flight:
+            raise HTTPException(status_code=409, detail="Request dengan Idempotency-Key ini masih diproses")
+        _in_flight.add(kunci)
+    try:
+        yield IdempotencyKey(kunci)
+    finally:
+        with _lock:
+            _in_flight.discard(kunci)
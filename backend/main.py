@@ -1,8 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import database_op, hardware, auth, parking, wallet, admin
+from backend.routers import database_op, hardware, auth, parking, wallet, admin, metrics
+from backend import booking_expiry
+from backend.database import acquire_instance_lock, run_migrations
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cache & antrian in-process: hanya satu proses backend per database
+    instance_lock = await acquire_instance_lock()
+
+    # Skema database selalu di-upgrade ke migrasi terbaru sebelum melayani request
+    await run_migrations()
+
+    # Background task: batalkan booking pending yang QR-nya kadaluarsa
+    expiry_task = asyncio.create_task(booking_expiry.run())
+    yield
+    expiry_task.cancel()
+    try:
+        await expiry_task
+    except asyncio.CancelledError:
+        pass
+    if instance_lock is not None:
+        await instance_lock.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 origins = [
     "http://localhost:8080",   # untuk development
     "http://localhost:8880",   # jika frontend lokal
@@ -17,6 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotency-Replayed"],  # cursor listing /db/*, replay Idempotency-Key
 )
 
 # Include routers
@@ -26,6 +53,7 @@ auth_router = auth.router
 parking_router = parking.router
 wallet_router = wallet.router
 admin_router = admin.router
+metrics_router = metrics.router
 
 app.include_router(db_router, prefix="/db")
 app.include_router(hw_router, prefix="/hw")
@@ -33,6 +61,7 @@ app.include_router(auth_router, tags=["auth"])
 app.include_router(parking_router, tags=["parking"])
 app.include_router(wallet_router, tags=["wallet"])
 app.include_router(admin_router, tags=["admin"])
+app.include_router(metrics_router, tags=["metrics"])
 
 @app.get("/")
 def read_root():
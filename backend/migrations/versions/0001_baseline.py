@@ -0,0 +1,110 @@
+"""baseline: tabel awal (customer, admin, mikrokontroler, slot, aktuator, booking)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Database lama yang dibuat lewat Base.metadata.create_all sudah memiliki
+tabel-tabel ini, jadi setiap tabel hanya dibuat bila belum ada.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Mode offline (--sql) tidak punya koneksi untuk diinspeksi
+    if op.get_context().as_sql:
+        existing = set()
+    else:
+        existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "customer" not in existing:
+        op.create_table(
+            "customer",
+            sa.Column("id_customer", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(100), unique=True),
+            sa.Column("password", sa.String(100)),
+            sa.Column("email", sa.String(100), unique=True),
+            sa.Column("notelp", sa.String(16), unique=True),
+            sa.Column("saldo", sa.Integer()),
+        )
+        op.create_index("ix_customer_id_customer", "customer", ["id_customer"])
+
+    if "mikrokontroler" not in existing:
+        op.create_table(
+            "mikrokontroler",
+            sa.Column("id_mikrokontroler", sa.Integer(), primary_key=True),
+        )
+        op.create_index("ix_mikrokontroler_id_mikrokontroler", "mikrokontroler", ["id_mikrokontroler"])
+
+    if "slot_condition" not in existing:
+        op.create_table(
+            "slot_condition",
+            sa.Column("id_slot", sa.Integer(), primary_key=True),
+            sa.Column("booked", sa.Boolean(), nullable=False),
+            sa.Column("confirmed", sa.Boolean(), nullable=False),
+            sa.Column("occupied", sa.Boolean(), nullable=False),
+            sa.Column("alarmed", sa.Boolean(), nullable=False),
+            sa.Column("id_mikrokontroler", sa.Integer(),
+                      sa.ForeignKey("mikrokontroler.id_mikrokontroler", ondelete="CASCADE")),
+        )
+        op.create_index("ix_slot_condition_id_slot", "slot_condition", ["id_slot"])
+
+    if "aktuator" not in existing:
+        op.create_table(
+            "aktuator",
+            sa.Column("id_aktuator", sa.Integer(), primary_key=True),
+            sa.Column("nama_aktuator", sa.String(100)),
+            sa.Column("usable", sa.Boolean()),
+            sa.Column("kondisi_buka", sa.Boolean()),
+            sa.Column("aksi_gate", sa.String(100)),
+            sa.Column("id_mikrokontroler", sa.Integer(),
+                      sa.ForeignKey("mikrokontroler.id_mikrokontroler", ondelete="CASCADE")),
+        )
+        op.create_index("ix_aktuator_id_aktuator", "aktuator", ["id_aktuator"])
+
+    if "admin" not in existing:
+        op.create_table(
+            "admin",
+            sa.Column("id_admin", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(100), unique=True),
+            sa.Column("password", sa.String(100)),
+            sa.Column("email", sa.String(100), unique=True),
+            sa.Column("notelp", sa.String(16), unique=True),
+        )
+        op.create_index("ix_admin_id_admin", "admin", ["id_admin"])
+
+    if "booking" not in existing:
+        op.create_table(
+            "booking",
+            sa.Column("id_booking", sa.Integer(), primary_key=True),
+            sa.Column("id_parkir", sa.Integer(), sa.ForeignKey("slot_condition.id_slot")),
+            sa.Column("id_customer", sa.Integer(), sa.ForeignKey("customer.id_customer")),
+            sa.Column("waktu_booking", sa.DateTime()),
+            sa.Column("waktu_masuk", sa.DateTime(), nullable=True),
+            sa.Column("waktu_keluar", sa.DateTime(), nullable=True),
+            sa.Column("status", sa.String(20)),
+            sa.Column("qr_token", sa.String(255), nullable=True),
+            sa.Column("qr_expires_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_booking_id_booking", "booking", ["id_booking"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("booking")
+    op.drop_table("admin")
+    op.drop_table("aktuator")
+    op.drop_table("slot_condition")
+    op.drop_table("mikrokontroler")
+    op.drop_table("customer")
@@ -0,0 +1,35 @@
+"""index untuk query booking yang paling sering dipakai
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- qr_token (unique)          -> /admin/scan
+- (id_customer, status)      -> /parking/active, /parking/book, /parking/cancel
+- (status, waktu_keluar)     -> /admin/reports
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_booking_qr_token", "booking", ["qr_token"], unique=True)
+    op.create_index("ix_booking_customer_status", "booking", ["id_customer", "status"])
+    op.create_index("ix_booking_status_waktu_keluar", "booking", ["status", "waktu_keluar"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_booking_status_waktu_keluar", table_name="booking")
+    op.drop_index("ix_booking_customer_status", table_name="booking")
+    op.drop_index("ix_booking_qr_token", table_name="booking")
@@ -0,0 +1,107 @@
+"""biaya & durasi pada booking, tabel rollup daily_revenue
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Booking yang sudah ada di-backfill sekali: biaya/durasi dihitung dengan
+tarif yang sama seperti calculate_parking_cost, lalu daily_revenue diisi
+dari booking tersebut.
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tarif saat migrasi dibuat (lihat calculate_parking_cost)
+FIRST_HOUR_RATE = 10000
+EXTRA_HOUR_RATE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("booking", sa.Column("biaya", sa.Integer(), nullable=True))
+    op.add_column("booking", sa.Column("durasi_jam", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "daily_revenue",
+        sa.Column("tanggal", sa.Date(), primary_key=True),
+        sa.Column("pendapatan", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jumlah_masuk", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jumlah_keluar", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    if not op.get_context().as_sql:
+        _backfill()
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    booking = sa.table(
+        "booking",
+        sa.column("id_booking", sa.Integer),
+        sa.column("status", sa.String),
+        sa.column("waktu_booking", sa.DateTime),
+        sa.column("waktu_masuk", sa.DateTime),
+        sa.column("waktu_keluar", sa.DateTime),
+        sa.column("biaya", sa.Integer),
+        sa.column("durasi_jam", sa.Integer),
+    )
+    daily_revenue = sa.table(
+        "daily_revenue",
+        sa.column("tanggal", sa.Date),
+        sa.column("pendapatan", sa.Integer),
+        sa.column("jumlah_masuk", sa.Integer),
+        sa.column("jumlah_keluar", sa.Integer),
+    )
+
+    rows = bind.execute(
+        sa.select(booking.c.id_booking, booking.c.status, booking.c.waktu_booking,
+                  booking.c.waktu_masuk, booking.c.waktu_keluar)
+        .where(sa.or_(booking.c.waktu_masuk.isnot(None), booking.c.status == "completed"))
+    ).all()
+
+    charged = []
+    days = defaultdict(lambda: {"pendapatan": 0, "jumlah_masuk": 0, "jumlah_keluar": 0})
+    for id_booking, status, waktu_booking, waktu_masuk, waktu_keluar in rows:
+        if waktu_masuk:
+            days[waktu_masuk.date()]["jumlah_masuk"] += 1
+        if status != "completed" or not waktu_keluar:
+            continue
+        start = waktu_masuk or waktu_booking
+        elapsed_ms = (waktu_keluar - start).total_seconds() * 1000
+        hours = max(1, int((elapsed_ms / (60 * 60 * 1000)) + 0.99))
+        cost = FIRST_HOUR_RATE + max(0, hours - 1) * EXTRA_HOUR_RATE
+        charged.append({"b_id": id_booking, "biaya": cost, "durasi_jam": hours})
+        days[waktu_keluar.date()]["jumlah_keluar"] += 1
+        # Laporan lama hanya menghitung pendapatan booking dengan waktu_masuk
+        if waktu_masuk:
+            days[waktu_keluar.date()]["pendapatan"] += cost
+
+    if charged:
+        bind.execute(
+            booking.update()
+            .where(booking.c.id_booking == sa.bindparam("b_id"))
+            .values(biaya=sa.bindparam("biaya"), durasi_jam=sa.bindparam("durasi_jam")),
+            charged,
+        )
+    if days:
+        bind.execute(
+            daily_revenue.insert(),
+            [{"tanggal": day, **totals} for day, totals in days.items()],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("daily_revenue")
+    op.drop_column("booking", "durasi_jam")
+    op.drop_column("booking", "biaya")
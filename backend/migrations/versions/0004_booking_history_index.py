@@ -0,0 +1,29 @@
+"""index keyset untuk /parking/history
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+- (id_customer, waktu_booking, id_booking) -> /parking/history?limit=&cursor=
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_booking_customer_history", "booking", ["id_customer", "waktu_booking", "id_booking"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_booking_customer_history", table_name="booking")
@@ -0,0 +1,32 @@
+"""index untuk filter listing /db/booking
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+- (status)         -> /db/booking?status= (InnoDB menyertakan PK -> urut id_booking)
+- (waktu_booking)  -> /db/booking?from=&to=
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_booking_status", "booking", ["status"])
+    op.create_index("ix_booking_waktu_booking", "booking", ["waktu_booking"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_booking_waktu_booking", table_name="booking")
+    op.drop_index("ix_booking_status", table_name="booking")
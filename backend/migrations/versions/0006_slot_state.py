@@ -0,0 +1,38 @@
+"""kolom bitmask slot_condition.state (generated) + index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+state = booked + 2*confirmed + 4*occupied + 8*alarmed (lihat backend/slot_status.py).
+Kolom VIRTUAL dihitung database sendiri, jadi semua jalur tulis tetap benar
+tanpa perubahan; index-nya dipakai untuk count/list per status.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATE_SQL = "booked + 2 * confirmed + 4 * occupied + 8 * alarmed"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "slot_condition",
+        sa.Column("state", sa.SmallInteger(), sa.Computed(STATE_SQL, persisted=False))
+    )
+    op.create_index("ix_slot_condition_state", "slot_condition", ["state"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_slot_condition_state", table_name="slot_condition")
+    op.drop_column("slot_condition", "state")
@@ -0,0 +1,50 @@
+"""ledger append-only wallet_transaction
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Saldo customer yang sudah ada dicatat sekali sebagai transaksi "opening",
+sehingga saldo_setelah baris terakhir selalu sama dengan customer.saldo.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "wallet_transaction",
+        sa.Column("id_transaksi", sa.Integer(), primary_key=True),
+        sa.Column("id_customer", sa.Integer(), sa.ForeignKey("customer.id_customer"), nullable=False),
+        sa.Column("id_booking", sa.Integer(), sa.ForeignKey("booking.id_booking"), nullable=True),
+        sa.Column("jenis", sa.String(20), nullable=False),
+        sa.Column("jumlah", sa.Integer(), nullable=False),
+        sa.Column("saldo_setelah", sa.Integer(), nullable=False),
+        sa.Column("waktu", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_wallet_transaction_id_transaksi", "wallet_transaction", ["id_transaksi"])
+    op.create_index("ix_wallet_transaction_customer", "wallet_transaction", ["id_customer", "id_transaksi"])
+
+    # Saldo awal (INSERT ... SELECT, tanpa membaca baris ke Python)
+    op.execute(
+        "INSERT INTO wallet_transaction (id_customer, jenis, jumlah, saldo_setelah, waktu) "
+        "SELECT id_customer, 'opening', saldo, saldo, CURRENT_TIMESTAMP FROM customer "
+        "WHERE saldo IS NOT NULL AND saldo <> 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_wallet_transaction_customer", table_name="wallet_transaction")
+    op.drop_index("ix_wallet_transaction_id_transaksi", table_name="wallet_transaction")
+    op.drop_table("wallet_transaction")
@@ -0,0 +1,38 @@
+"""tabel idempotency_key untuk header Idempotency-Key
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Menyimpan response pertama /parking/book, /wallet/topup dan /admin/scan per
+key, sehingga retry dari client mendapat response yang sama tanpa efek ganda.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "idempotency_key",
+        sa.Column("kunci", sa.String(64), primary_key=True),
+        sa.Column("status_code", sa.Integer(), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("dibuat", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_idempotency_key_dibuat", "idempotency_key", ["dibuat"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_idempotency_key_dibuat", table_name="idempotency_key")
+    op.drop_table("idempotency_key")
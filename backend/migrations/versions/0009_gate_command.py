@@ -0,0 +1,42 @@
+"""antrian perintah gate (gate_command) dengan nomor urut & ack
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+Setiap scan yang membuka gate menambah satu baris; ESP32 menerima perintah
+pending lewat /hw/instruction dan meng-ack nomor urutnya lewat /hw/update-gate.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "gate_command",
+        sa.Column("id_command", sa.Integer(), primary_key=True),
+        sa.Column("id_aktuator", sa.Integer(),
+                  sa.ForeignKey("aktuator.id_aktuator", ondelete="CASCADE"), nullable=False),
+        sa.Column("perintah", sa.String(20), nullable=False),
+        sa.Column("dibuat", sa.DateTime(), nullable=True),
+        sa.Column("diakui", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_gate_command_id_command", "gate_command", ["id_command"])
+    op.create_index("ix_gate_command_pending", "gate_command", ["diakui", "id_command"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_gate_command_pending", table_name="gate_command")
+    op.drop_index("ix_gate_command_id_command", table_name="gate_command")
+    op.drop_table("gate_command")
@@ -0,0 +1,35 @@
+"""kolom slot_condition.bookable (slot yang boleh dibooking pengguna)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+
+Aturan "hanya slot 1 dan 2 yang bisa dibooking" sebelumnya ditulis di
+frontend (isBookableSpot) dan backend. Sekarang disimpan per slot dan
+dikirim di payload spot; nilai awal mengikuti aturan lama.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "slot_condition",
+        sa.Column("bookable", sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+    op.execute("UPDATE slot_condition SET bookable = 1 WHERE id_slot IN (1, 2)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("slot_condition", "bookable")
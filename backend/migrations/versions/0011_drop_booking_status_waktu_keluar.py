@@ -0,0 +1,31 @@
+"""hapus index booking (status, waktu_keluar)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+
+Index ini (0002) dibuat untuk /admin/reports yang dulu menjumlah booking
+completed per rentang waktu_keluar. Sejak 0003 laporan membaca rollup
+daily_revenue, jadi tidak ada query yang memakainya lagi; index hanya
+menambah biaya tulis pada scan exit.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, Sequence[str], None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index("ix_booking_status_waktu_keluar", table_name="booking")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_booking_status_waktu_keluar", "booking", ["status", "waktu_keluar"])
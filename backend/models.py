@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, ForeignKey, DateTime, Date, Boolean, Index, Computed, Text, false
 from sqlalchemy.orm import relationship
 import datetime
 from datetime import timezone, timedelta
 from backend.database import Base
+import backend.slot_status as slot_status
 
 # GMT+7 timezone
 GMT7 = timezone(timedelta(hours=7))
@@ -50,6 +51,9 @@ class Slot(Base):
     confirmed = Column(Boolean, default=False, nullable=False) # Slot sdh dikonfirmasi (true bila sudah scan)
     occupied = Column(Boolean, default=False, nullable=False) # Slot sedang ada mobilnya
     alarmed = Column(Boolean, default=False, nullable=False) # Slot yg belum confirm tapi sdh occupied (alarm bunyi)
+    bookable = Column(Boolean, default=False, server_default=false(), nullable=False) # Boleh dibooking pengguna (0010)
+    # Bitmask booked|confirmed|occupied|alarmed (generated, ber-index; lihat slot_status.py)
+    state = Column(SmallInteger, Computed(slot_status.STATE_SQL, persisted=False), index=True)
     id_mikrokontroler = Column(Integer,
                                ForeignKey("mikrokontroler.id_mikrokontroler", ondelete="CASCADE"))
 
@@ -103,7 +107,78 @@ class Booking(Base):
     status = Column(String(20), default="pending")
     qr_token = Column(String(255), nullable=True)  # Store QR token
     qr_expires_at = Column(DateTime, nullable=True)  # QR expiration time
+    biaya = Column(Integer, nullable=True)  # Biaya yang ditagih saat keluar
+    durasi_jam = Column(Integer, nullable=True)  # Durasi parkir yang ditagih (jam)
 
     # Relasi
     customer = relationship("Customer")
-    parkir = relationship("Slot")
\ No newline at end of file
+    parkir = relationship("Slot")
+
+    # Index untuk query yang paling sering (lihat migrations/versions/0002)
+    __table_args__ = (
+        Index("ix_booking_qr_token", "qr_token", unique=True),      # /admin/scan
+        Index("ix_booking_customer_status", "id_customer", "status"),  # /parking/active, book, cancel
+        Index("ix_booking_customer_history", "id_customer", "waktu_booking", "id_booking"),  # /parking/history (0004)
+        Index("ix_booking_status", "status"),  # /db/booking?status= (0005)
+        Index("ix_booking_waktu_booking", "waktu_booking"),  # /db/booking?from=&to= (0005)
+    )
+
+# ==========================
+# DAILY REVENUE (ROLLUP)
+# ==========================
+class DailyRevenue(Base):
+    __tablename__ = "daily_revenue"
+
+    # Diperbarui secara incremental saat scan masuk/keluar (lihat admin.scan_qr)
+    tanggal = Column(Date, primary_key=True)  # Tanggal (GMT+7)
+    pendapatan = Column(Integer, default=0, nullable=False)
+    jumlah_masuk = Column(Integer, default=0, nullable=False)
+    jumlah_keluar = Column(Integer, default=0, nullable=False)
+
+# ==========================
+# WALLET LEDGER (APPEND-ONLY)
+# ==========================
+class WalletTransaction(Base):
+    __tablename__ = "wallet_transaction"
+
+    # Satu baris per perubahan customer.saldo (lihat backend/wallet_ledger.py)
+    id_transaksi = Column(Integer, primary_key=True, index=True)
+    id_customer = Column(Integer, ForeignKey("customer.id_customer"), nullable=False)
+    id_booking = Column(Integer, ForeignKey("booking.id_booking"), nullable=True)  # Diisi untuk pembayaran parkir
+    jenis = Column(String(20), nullable=False)  # topup / charge / opening
+    jumlah = Column(Integer, nullable=False)  # Delta saldo (negatif untuk pembayaran)
+    saldo_setelah = Column(Integer, nullable=False)  # Snapshot saldo setelah transaksi ini
+    waktu = Column(DateTime, default=get_now_gmt7)
+
+    __table_args__ = (
+        Index("ix_wallet_transaction_customer", "id_customer", "id_transaksi"),  # /wallet/transactions (0007)
+    )
+
+# ==========================
+# IDEMPOTENCY KEY
+# ==========================
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+
+    # Response tersimpan per header Idempotency-Key (lihat backend/idempotency.py)
+    kunci = Column(String(64), primary_key=True)  # sha256(role:id:path:Idempotency-Key)
+    status_code = Column(Integer, nullable=False)
+    response = Column(Text, nullable=False)  # Body JSON response pertama
+    dibuat = Column(DateTime, default=get_now_gmt7, index=True)  # Untuk purge setelah TTL
+
+# ==========================
+# GATE COMMAND QUEUE
+# ==========================
+class GateCommand(Base):
+    __tablename__ = "gate_command"
+
+    # id_command = nomor urut perintah (dikirim lewat /hw/instruction, di-ack lewat /hw/update-gate)
+    id_command = Column(Integer, primary_key=True, index=True)
+    id_aktuator = Column(Integer, ForeignKey("aktuator.id_aktuator", ondelete="CASCADE"), nullable=False)
+    perintah = Column(String(20), nullable=False, default="open")
+    dibuat = Column(DateTime, default=get_now_gmt7)
+    diakui = Column(DateTime, nullable=True)  # Waktu ack dari ESP32 (NULL = masih pending)
+
+    __table_args__ = (
+        Index("ix_gate_command_pending", "diakui", "id_command"),  # muat ulang perintah pending saat start (0009)
+    )
@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ================================
+# KEYSET PAGINATION
+# ================================
+# Cursor = nilai kolom urutan dari baris terakhir halaman sebelumnya,
+# di-encode base64url (opaque bagi client). Halaman berikutnya dibaca dengan
+# WHERE (kolom) < cursor lewat index, tanpa OFFSET.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row of a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    """Decode a cursor into `size` raw values; 400 for anything malformed"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor tidak valid")
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Datetime part of a cursor (None stays None)"""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="cursor tidak valid")
+
+
+# ================================
+# LISTING /db/* (limit, cursor, filter, ?fields=)
+# ================================
+# Diurutkan menurut primary key; cursor berikutnya dikirim lewat header
+# X-Next-Cursor sehingga body tetap berupa list seperti sebelumnya.
+# Tanpa limit dan cursor semua baris dikembalikan (perilaku lama); paging
+# aktif begitu client mengirim salah satunya.
+
+DEFAULT_LIST_SIZE = 100   # dipakai bila client hanya mengirim cursor
+MAX_LIST_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def parse_fields(fields: Optional[str], model, schema: type[BaseModel]) -> Optional[list]:
+    """Columns selected by `?fields=a,b` (primary key always included); 400 for unknown names"""
+    if not fields:
+        return None
+    columns = model.__table__.columns
+    allowed = [name for name in schema.model_fields if name in columns]
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fields tidak dikenal: {', '.join(unknown)} (pilihan: {', '.join(allowed)})"
+        )
+    key = model.__mapper__.primary_key[0].name
+    if key not in names:
+        names.insert(0, key)
+    return [getattr(model, name) for name in names]
+
+
+async def list_page(
+    db: AsyncSession,
+    model,
+    schema: type[BaseModel],
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Iterable = (),
+    options: Iterable = (),
+) -> JSONResponse:
+    """One keyset page of `model` as a JSON list, next cursor in the X-Next-Cursor header.
+
+    Without `limit` and `cursor` every row is returned in one list.
+    """
+    key = model.__mapper__.primary_key[0]
+    columns = parse_fields(fields, model, schema)
+
+    query = select(*columns) if columns else select(model).options(*options)
+    query = query.where(*filters)
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.where(key > after[0])
+    query = query.order_by(key)
+    if limit is None and cursor:
+        limit = DEFAULT_LIST_SIZE
+    if limit is not None:
+        query = query.limit(limit + 1)
+    result = await db.execute(query)
+
+    if columns:
+        rows = [dict(row) for row in result.mappings()]
+    else:
+        rows = [schema.model_validate(obj, from_attributes=True).model_dump() for obj in result.scalars()]
+
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][key.name])
+    return JSONResponse(jsonable_encoder(rows), headers=headers)
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
 from typing import Optional
 
+import backend.gate_commands as gate_commands
+import backend.idempotency as idempotency
 import backend.models as models
-from backend.database import get_db
+import backend.schemas as schemas
+import backend.state_cache as state_cache
+import backend.wallet_ledger as wallet_ledger
+from backend.database import get_db, get_read_db
+from backend.idempotency import IdempotencyKey, idempotency_key
+from backend.security import Principal, get_current_admin
 
 router = APIRouter()
 
+# Aktuator gate masuk / keluar (idGate pada response scan)
+ENTRY_GATE_ID = 1
+EXIT_GATE_ID = 2
+
+# Batas jumlah scan per POST /admin/scan/batch
+MAX_SCAN_BATCH = 1000
+
 FIRST_HOUR_RATE = 10000
 EXTRA_HOUR_RATE = 5000
 
@@ -18,35 +36,6 @@ def get_now_gmt7():
     """Get current datetime in GMT+7 timezone"""
     return datetime.now(GMT7)
 
-def get_admin_from_request(authorization: Optional[str] = None, db: Session = Depends(get_db)):
-    """Get admin from authorization header"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    # Simple token extraction (in production, use proper JWT)
-    token = authorization.replace("Bearer ", "").strip()
-    try:
-        if token.startswith("token-"):
-            admin_id = int(token.split("token-")[1])
-        else:
-            admin_id = int(token) if token.isdigit() else None
-    except:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    if not admin_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    # Check if user is admin (for demo, accept any user)
-    # In production, check role properly
-    admin = db.query(models.Admin).filter(models.Admin.id_admin == admin_id).first()
-    if not admin:
-        # For demo, also accept customer as admin
-        customer = db.query(models.Customer).filter(models.Customer.id_customer == admin_id).first()
-        if not customer:
-            raise HTTPException(status_code=401, detail="User not found")
-    
-    return admin_id
-
 def calculate_parking_cost(start_time: datetime, end_time: Optional[datetime] = None):
     """Calculate parking cost"""
     if not end_time:
@@ -61,74 +50,106 @@ def calculate_parking_cost(start_time: datetime, end_time: Optional[datetime] =
     cost = FIRST_HOUR_RATE + max(0, hours - 1) * EXTRA_HOUR_RATE
     return {"hours": hours, "cost": cost}
 
+async def add_daily_revenue(db: AsyncSession, day: date, pendapatan: int = 0, jumlah_masuk: int = 0, jumlah_keluar: int = 0):
+    """Increment the daily_revenue rollup row of `day` (inside the caller's transaction)"""
+    values = {
+        models.DailyRevenue.pendapatan: models.DailyRevenue.pendapatan + pendapatan,
+        models.DailyRevenue.jumlah_masuk: models.DailyRevenue.jumlah_masuk + jumlah_masuk,
+        models.DailyRevenue.jumlah_keluar: models.DailyRevenue.jumlah_keluar + jumlah_keluar,
+    }
+    increment = (
+        update(models.DailyRevenue)
+        .where(models.DailyRevenue.tanggal == day)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    if (await db.execute(increment)).rowcount:
+        return
+
+    # Baris pertama hari ini; bila request lain lebih dulu insert, ulangi UPDATE
+    try:
+        async with db.begin_nested():
+            db.add(models.DailyRevenue(
+                tanggal=day,
+                pendapatan=pendapatan,
+                jumlah_masuk=jumlah_masuk,
+                jumlah_keluar=jumlah_keluar
+            ))
+    except IntegrityError:
+        await db.execute(increment)
+
+async def find_scan_booking(db: AsyncSession, qr_token: str) -> Optional[models.Booking]:
+    """Active booking of a QR token with its slot and customer, in one query"""
+    query = (
+        select(models.Booking)
+        .options(joinedload(models.Booking.parkir), joinedload(models.Booking.customer))
+        .where(models.Booking.qr_token == qr_token, models.Booking.status.in_(["pending", "checked-in"]))
+    )
+    # Lewat ix_booking_qr_token (unik)
+    return (await db.scalars(query)).first()
+
+async def open_gate(db: AsyncSession, id_aktuator: int, after_commit: list) -> bool:
+    """
+    Queue an open command for a gate known to the state cache (no SELECT).
+    kondisi_buka tetap diset untuk tampilan admin; ESP32 membuka gate per
+    perintah di gate_command. False bila gate tidak ada.
+    """
+    if not await state_cache.get_gate(db, id_aktuator):
+        return False
+    await db.execute(
+        update(models.Aktuator)
+        .where(models.Aktuator.id_aktuator == id_aktuator)
+        .values(kondisi_buka=True)
+        .execution_options(synchronize_session=False)
+    )
+    command = await gate_commands.enqueue(db, id_aktuator)
+    after_commit.append(partial(state_cache.set_gate, id_aktuator, kondisi_buka=True))
+    after_commit.append(partial(gate_commands.publish, command))
+    return True
+
 @router.get("/admin/spots")
-def get_admin_spots(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_admin_spots(
+    admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all parking spots for admin view"""
-    get_admin_from_request(authorization, db)
-    
-    slots = db.query(models.Slot).all()
+    slots = await state_cache.get_slots(db)
     
     spots = []
     for slot in slots:
         # Availability is driven only by `booked`
         is_available = not slot.booked
 
-        # Derive status consistent with user view
-        if not slot.booked and not slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "available"
-        elif slot.booked and not slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "booked"
-        elif slot.booked and slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "confirmed"
-        elif slot.booked and slot.confirmed and slot.occupied and not slot.alarmed:
-            status = "occupied"
-        elif (not slot.confirmed) and slot.occupied and slot.alarmed:
-            status = "alert"
-        else:
-            status = "unknown"
-        
         spots.append({
             "id": f"S{slot.id_slot}",
             "name": f"Slot {slot.id_slot}",
             "code": f"P-{slot.id_slot}",
             "level": 1,
             "isAvailable": is_available,
-            "status": status,
+            "bookable": slot.bookable,
+            "status": slot.status,  # sama dengan user view (backend/slot_status.py)
             "ratePerHour": FIRST_HOUR_RATE
         })
     
     return {"spots": spots}
 
-@router.post("/admin/scan")
-def scan_qr(
-    scan_data: dict,
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
-):
-    """Scan QR code for entry/exit validation"""
-    get_admin_from_request(authorization, db)
-    
-    qr_token = scan_data.get("qrToken")
-    action = scan_data.get("action")
-    
-    if not qr_token or not action:
-        raise HTTPException(status_code=400, detail="qrToken dan action diperlukan")
+async def apply_scan(db: AsyncSession, qr_token: str, action: str, now: datetime, after_commit: list) -> dict:
+    """
+    Apply one enter/exit scan inside the caller's transaction and return its response.
+    `now` adalah waktu scan; update state cache ditambahkan ke `after_commit`
+    dan baru dijalankan pemanggil setelah commit berhasil.
+    """
+    if action not in ("enter", "exit"):
+        raise HTTPException(status_code=400, detail="Aksi tidak dikenal")
     
-    # Find booking by QR token
-    booking = db.query(models.Booking).filter(
-        models.Booking.qr_token == qr_token,
-        models.Booking.status.in_(["pending", "checked-in"])
-    ).first()
+    # Find booking by QR token, with slot & customer in the same query
+    booking = await find_scan_booking(db, qr_token)
     
     if not booking:
         raise HTTPException(status_code=404, detail="QR tidak ditemukan atau sudah tidak valid")
     
     # Check if QR token expired
     # Note: Expiry only blocks "enter". For "exit" (checked-in), allow even if QR past TTL.
-    now = get_now_gmt7()
     if action == "enter":
         if booking.qr_expires_at:
             if booking.qr_expires_at.tzinfo is None:
@@ -138,173 +159,181 @@ def scan_qr(
             if qr_expires_at_aware < now:
                 raise HTTPException(status_code=400, detail="QR code sudah kadaluarsa")
     
+    slot = booking.parkir
+    slot_id = booking.id_parkir
+    
     if action == "enter":
         if booking.status == "checked-in":
             raise HTTPException(status_code=400, detail="Kedatangan sudah dikonfirmasi")
         
         # Mark as checked-in
         booking.status = "checked-in"
-        booking.waktu_masuk = get_now_gmt7()
+        booking.waktu_masuk = now
+        await add_daily_revenue(db, booking.waktu_masuk.date(), jumlah_masuk=1)
         
-        # Mark slot as confirmed - id_parkir directly references slot.id_slot
-        slot = db.query(models.Slot).filter(
-            models.Slot.id_slot == booking.id_parkir
-        ).first()
+        # Mark slot as confirmed (dimuat bersama booking)
         if slot:
             slot.confirmed = True
+            after_commit.append(partial(state_cache.set_slot, slot_id, confirmed=True))
         
         # Update aktuator kondisi_buka untuk gate masuk (idGate: 1)
-        aktuator = db.query(models.Aktuator).filter(models.Aktuator.id_aktuator == 1).first()
-        if aktuator:
-            aktuator.kondisi_buka = True
+        await open_gate(db, ENTRY_GATE_ID, after_commit)
         
-        db.commit()
         return {
             "message": "Masuk Dikonfirmasi Admin",
-            "idGate": 1,
+            "idGate": ENTRY_GATE_ID,
             "kondisi_buka": True
         }
     
-    elif action == "exit":
-        if booking.status != "checked-in":
-            raise HTTPException(status_code=400, detail="Belum masuk atau sudah selesai")
-        
-        # Get customer
-        customer = db.query(models.Customer).filter(
-            models.Customer.id_customer == booking.id_customer
-        ).first()
-        
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer tidak ditemukan")
-        
-        # Calculate cost
-        start_time = booking.waktu_masuk if booking.waktu_masuk else booking.waktu_booking
-        cost_info = calculate_parking_cost(start_time)
-        
-        # Check wallet balance
-        if (customer.saldo or 0) < cost_info["cost"]:
-            raise HTTPException(status_code=400, detail="Saldo user tidak cukup")
-        
-        # Deduct from wallet
-        customer.saldo = (customer.saldo or 0) - cost_info["cost"]
-        
-        # Update booking
-        booking.status = "completed"
-        booking.waktu_keluar = get_now_gmt7()
+    if booking.status != "checked-in":
+        raise HTTPException(status_code=400, detail="Belum masuk atau sudah selesai")
+    
+    # Calculate cost
+    start_time = booking.waktu_masuk if booking.waktu_masuk else booking.waktu_booking
+    cost_info = calculate_parking_cost(start_time, now)
+    
+    if not booking.customer:
+        raise HTTPException(status_code=404, detail="Customer tidak ditemukan")
+    
+    # Deduct from wallet (atomik: gagal bila saldo tidak cukup, dicatat di ledger)
+    balance = await wallet_ledger.apply(
+        db, booking.id_customer, -cost_info["cost"], wallet_ledger.CHARGE, id_booking=booking.id_booking
+    )
+    if balance is None:
+        raise HTTPException(status_code=400, detail="Saldo user tidak cukup")
+    
+    # Update booking (biaya & durasi disimpan untuk laporan/riwayat)
+    booking.status = "completed"
+    booking.waktu_keluar = now
+    booking.biaya = cost_info["cost"]
+    booking.durasi_jam = cost_info["hours"]
+    await add_daily_revenue(db, booking.waktu_keluar.date(), pendapatan=cost_info["cost"], jumlah_keluar=1)
+    
+    # Free up slot (dimuat bersama booking)
+    if slot:
+        slot.booked = False
+        slot.occupied = False
+        slot.confirmed = False
+        after_commit.append(partial(state_cache.set_slot, slot_id, booked=False, occupied=False, confirmed=False))
+    
+    # Update aktuator kondisi_buka untuk gate keluar (idGate: 2)
+    await open_gate(db, EXIT_GATE_ID, after_commit)
+    
+    return {
+        "message": "Keluar Dikonfirmasi Admin",
+        "idGate": EXIT_GATE_ID,
+        "kondisi_buka": True
+    }
+
+@router.post("/admin/scan")
+async def scan_qr(
+    scan_data: dict,
+    admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+    idem: IdempotencyKey = Depends(idempotency_key)
+):
+    """Scan QR code for entry/exit validation (retry aman dengan header Idempotency-Key)"""
+    if idem.response is not None:
+        return idem.response
+    qr_token = scan_data.get("qrToken")
+    action = scan_data.get("action")
+    
+    if not qr_token or not action:
+        raise HTTPException(status_code=400, detail="qrToken dan action diperlukan")
+    
+    after_commit = []
+    response = await idem.save(db, await apply_scan(db, qr_token, action, get_now_gmt7(), after_commit))
+    await db.commit()
+    for apply_change in after_commit:
+        apply_change()
+    return response
+
+@router.post("/admin/scan/batch")
+async def scan_qr_batch(
+    batch: schemas.ScanBatch,
+    admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply buffered scans (offline scanner) in order, in one transaction.
+    Tiap scan berjalan di savepoint sendiri: scan yang gagal tidak membatalkan
+    yang lain. Scan dengan scanId yang sudah pernah berhasil (lewat batch ini
+    atau header Idempotency-Key di /admin/scan) tidak diproses ulang.
+    """
+    if len(batch.scans) > MAX_SCAN_BATCH:
+        raise HTTPException(status_code=413, detail=f"Maksimal {MAX_SCAN_BATCH} scan per batch")
+    
+    now = get_now_gmt7()
+    after_commit = []
+    results = []
+    seen = {}
+    for item in batch.scans:
+        kunci = idempotency.make_key(admin, "/admin/scan", item.scanId) if item.scanId else None
+        stored = seen.get(kunci) if kunci else None
+        if kunci and stored is None:
+            stored = await idempotency.lookup(db, kunci)
+        if stored is not None:
+            results.append({"scanId": item.scanId, "status": stored[0], "replayed": True, "response": stored[1]})
+            continue
         
-        # Free up slot - id_parkir directly references slot.id_slot
-        slot = db.query(models.Slot).filter(
-            models.Slot.id_slot == booking.id_parkir
-        ).first()
-        if slot:
-            slot.booked = False
-            slot.occupied = False
-            slot.confirmed = False
+        # Waktu scan dari scanner (tidak boleh di masa depan); naive dianggap GMT+7
+        scanned_at = item.scannedAt or now
+        if scanned_at.tzinfo is None:
+            scanned_at = scanned_at.replace(tzinfo=GMT7)
+        # Timestamp ber-timezone lain (mis. UTC) dikonversi dulu: jam tercatat selalu GMT+7
+        scanned_at = min(scanned_at.astimezone(GMT7), now)
         
-        # Update aktuator kondisi_buka untuk gate keluar (idGate: 2)
-        aktuator = db.query(models.Aktuator).filter(models.Aktuator.id_aktuator == 2).first()
-        if aktuator:
-            aktuator.kondisi_buka = True
+        item_changes = []
+        try:
+            async with db.begin_nested():
+                response = await apply_scan(db, item.qrToken, item.action, scanned_at, item_changes)
+        except HTTPException as e:
+            results.append({"scanId": item.scanId, "status": e.status_code, "replayed": False, "detail": e.detail})
+            continue
         
-        db.commit()
-        return {
-            "message": "Keluar Dikonfirmasi Admin",
-            "idGate": 2,
-            "kondisi_buka": True
-        }
+        after_commit.extend(item_changes)
+        if kunci:
+            await idempotency.store(db, kunci, response)
+            seen[kunci] = (200, response)
+        results.append({"scanId": item.scanId, "status": 200, "replayed": False, "response": response})
     
-    else:
-        raise HTTPException(status_code=400, detail="Aksi tidak dikenal")
+    await db.commit()
+    for apply_change in after_commit:
+        apply_change()
+    
+    return {
+        "results": results,
+        "applied": sum(1 for r in results if r["status"] == 200 and not r["replayed"]),
+        "replayed": sum(1 for r in results if r["replayed"]),
+        "failed": sum(1 for r in results if r["status"] != 200)
+    }
 
 @router.get("/admin/reports")
-def get_reports(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_reports(
+    admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get admin reports"""
     try:
-        get_admin_from_request(authorization, db)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authorization failed: {str(e)}")
-    
-    try:
-        # Calculate today's date range - convert to timezone-naive for MySQL compatibility
-        now = get_now_gmt7()
-        # MySQL stores datetime as timezone-naive, so convert comparison times to naive
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        
-        # Convert to naive datetime for MySQL comparison (strip timezone info)
-        if today_start.tzinfo:
-            today_start_naive = today_start.replace(tzinfo=None)
-        else:
-            today_start_naive = today_start
-        
-        if today_end.tzinfo:
-            today_end_naive = today_end.replace(tzinfo=None)
-        else:
-            today_end_naive = today_end
-        
-        # Get today's completed bookings - only where waktu_keluar is not None
-        today_bookings = db.query(models.Booking).filter(
-            models.Booking.status == "completed",
-            models.Booking.waktu_keluar.isnot(None),
-            models.Booking.waktu_keluar >= today_start_naive,
-            models.Booking.waktu_keluar < today_end_naive
-        ).all()
-        
-        # Calculate revenue
-        today_revenue = 0
-        today_entries = 0
-        today_exits = 0
-        
-        for booking in today_bookings:
-            if booking.waktu_masuk and booking.waktu_keluar:
-                start_time = booking.waktu_masuk
-                end_time = booking.waktu_keluar
-                cost_info = calculate_parking_cost(start_time, end_time)
-                today_revenue += cost_info["cost"]
-            
-            # Compare with naive datetime
-            if booking.waktu_masuk:
-                waktu_masuk_naive = booking.waktu_masuk.replace(tzinfo=None) if booking.waktu_masuk.tzinfo else booking.waktu_masuk
-                if waktu_masuk_naive >= today_start_naive:
-                    today_entries += 1
-            
-            if booking.waktu_keluar:
-                waktu_keluar_naive = booking.waktu_keluar.replace(tzinfo=None) if booking.waktu_keluar.tzinfo else booking.waktu_keluar
-                if waktu_keluar_naive >= today_start_naive:
-                    today_exits += 1
-        
-        # Calculate month revenue
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if month_start.tzinfo:
-            month_start_naive = month_start.replace(tzinfo=None)
-        else:
-            month_start_naive = month_start
+        # Laporan dibaca dari rollup daily_revenue (maks. 31 baris per bulan)
+        today = get_now_gmt7().date()
+        month_start = today.replace(day=1)
         
-        month_bookings = db.query(models.Booking).filter(
-            models.Booking.status == "completed",
-            models.Booking.waktu_keluar.isnot(None),
-            models.Booking.waktu_keluar >= month_start_naive
-        ).all()
+        today_row = await db.get(models.DailyRevenue, today)
         
-        month_revenue = 0
-        for booking in month_bookings:
-            if booking.waktu_masuk and booking.waktu_keluar:
-                start_time = booking.waktu_masuk
-                end_time = booking.waktu_keluar
-                cost_info = calculate_parking_cost(start_time, end_time)
-                month_revenue += cost_info["cost"]
+        month_revenue = await db.scalar(
+            select(func.coalesce(func.sum(models.DailyRevenue.pendapatan), 0)).where(
+                models.DailyRevenue.tanggal >= month_start,
+                models.DailyRevenue.tanggal <= today
+            )
+        )
         
         return {
             "reports": {
-                "todayRevenue": today_revenue,
-                "monthRevenue": month_revenue,
-                "todayEntries": today_entries,
-                "todayExits": today_exits
+                "todayRevenue": today_row.pendapatan if today_row else 0,
+                "monthRevenue": int(month_revenue or 0),
+                "todayEntries": today_row.jumlah_masuk if today_row else 0,
+                "todayExits": today_row.jumlah_keluar if today_row else 0
             }
         }
     except Exception as e:
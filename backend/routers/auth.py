@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from typing import Optional
@@ -9,16 +10,12 @@ import hashlib
 import backend.models as models
 import backend.schemas as schemas
 from backend.database import get_db
+from backend.security import ROLE_ADMIN, ROLE_USER, create_access_token
 
 router = APIRouter()
 
-# Simple token generation (for demo - in production use proper JWT)
-def create_access_token(user_id: int) -> str:
-    """Create simple access token"""
-    return f"token-{user_id}"
-
 @router.post("/auth/register")
-def register(user_data: schemas.RegisterRequest, db: Session = Depends(get_db)):
+async def register(user_data: schemas.RegisterRequest, db: AsyncSession = Depends(get_db)):
     """
     Register new customer
     Expected: {name, email, password, notelp}
@@ -32,13 +29,13 @@ def register(user_data: schemas.RegisterRequest, db: Session = Depends(get_db)):
             )
         
         # Check if email already exists
-        existing_customer = db.query(models.Customer).filter(
-            models.Customer.email == user_data.email
-        ).first()
+        existing_customer = (await db.scalars(
+            select(models.Customer).where(models.Customer.email == user_data.email)
+        )).first()
 
-        existing_admin = db.query(models.Admin).filter(
-            models.Admin.email == user_data.email
-        ).first()
+        existing_admin = (await db.scalars(
+            select(models.Admin).where(models.Admin.email == user_data.email)
+        )).first()
         
         if existing_customer or existing_admin:
             raise HTTPException(
@@ -59,28 +56,28 @@ def register(user_data: schemas.RegisterRequest, db: Session = Depends(get_db)):
         )
         
         db.add(new_customer)
-        db.commit()
-        db.refresh(new_customer)
+        await db.commit()
+        await db.refresh(new_customer)
         
         return {"message": "Registrasi berhasil"}
     
     except HTTPException:
         raise
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=409,
             detail="Email sudah terdaftar atau data tidak valid"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Terjadi kesalahan: {str(e)}"
         )
 
 @router.post("/auth/login")
-def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(credentials: schemas.LoginRequest, db: AsyncSession = Depends(get_db)):
     """
     Login user (customer or admin)
     Expected: {email, password}
@@ -90,9 +87,9 @@ def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
         password_hash = hashlib.sha256(credentials.password.encode()).hexdigest()
         
         # First, try to find as admin
-        admin = db.query(models.Admin).filter(
-            models.Admin.email == credentials.email
-        ).first()
+        admin = (await db.scalars(
+            select(models.Admin).where(models.Admin.email == credentials.email)
+        )).first()
         
         if admin:
             # Verify admin password (support both hashed and plain text for backward compatibility)
@@ -100,7 +97,7 @@ def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
             if admin.password:
                 # Check if password matches (hashed or plain text)
                 if admin.password == password_hash or admin.password == credentials.password:
-                    token = create_access_token(admin.id_admin)
+                    token = create_access_token(admin.id_admin, ROLE_ADMIN)
                     return {
                         "token": token,
                         "user": {
@@ -116,9 +113,9 @@ def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
             )
         
         # If not admin, try to find as customer
-        customer = db.query(models.Customer).filter(
-            models.Customer.email == credentials.email
-        ).first()
+        customer = (await db.scalars(
+            select(models.Customer).where(models.Customer.email == credentials.email)
+        )).first()
         
         if not customer:
             raise HTTPException(
@@ -134,7 +131,7 @@ def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
             )
         
         # Create token
-        token = create_access_token(customer.id_customer)
+        token = create_access_token(customer.id_customer, ROLE_USER)
         
         return {
             "token": token,
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+from datetime import datetime
+from typing import Optional
+import csv
+import io
+import json
 
 import backend.models as models, backend.schemas as schemas
-from backend.database import SessionLocal, engine, get_db
-
-models.Base.metadata.create_all(bind=engine)
+import backend.slot_status as slot_status
+import backend.state_cache as state_cache
+import backend.wallet_ledger as wallet_ledger
+from backend.database import ReadSessionLocal, get_db, get_read_db
+from backend.pagination import MAX_LIST_SIZE, list_page
+from backend.security import ROLE_ADMIN, ROLE_USER, forget_principal
 
 router = APIRouter()
 
@@ -13,41 +25,62 @@ router = APIRouter()
 # ==============================================================
 
 @router.post("/customer", response_model=schemas.Customer)
-def create_customer(customer: schemas.CustomerCreate, db: Session = Depends(get_db)):
-    new = models.Customer(**customer.dict())
+async def create_customer(customer: schemas.CustomerCreate, db: AsyncSession = Depends(get_db)):
+    # Saldo awal lewat ledger supaya tercatat di wallet_transaction
+    new = models.Customer(**customer.dict(exclude={"saldo"}), saldo=0)
     db.add(new)
-    db.commit()
-    db.refresh(new)
+    await db.flush()
+    if customer.saldo:
+        if await wallet_ledger.set_balance(db, new.id_customer, customer.saldo, wallet_ledger.OPENING) is None:
+            raise HTTPException(400, "Saldo tidak boleh negatif")
+    await db.commit()
+    await db.refresh(new)
     return new
 
 
 @router.get("/customer", response_model=list[schemas.Customer])
-def get_customers(db: Session = Depends(get_db)):
-    return db.query(models.Customer).all()
+async def get_customers(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    email: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    filters = []
+    if email is not None:
+        filters.append(models.Customer.email == email)
+    return await list_page(db, models.Customer, schemas.Customer,
+                           limit=limit, cursor=cursor, fields=fields, filters=filters)
 
 
 @router.put("/customer/{id_customer}", response_model=schemas.Customer)
-def update_customer(id_customer: int, data: schemas.CustomerCreate, db: Session = Depends(get_db)):
-    customer = db.query(models.Customer).filter(models.Customer.id_customer == id_customer).first()
+async def update_customer(id_customer: int, data: schemas.CustomerCreate, db: AsyncSession = Depends(get_db)):
+    customer = await db.get(models.Customer, id_customer)
     if not customer:
         raise HTTPException(404, "Customer not found")
 
-    for key, value in data.dict().items():
+    for key, value in data.dict(exclude={"saldo"}).items():
         setattr(customer, key, value)
-
-    db.commit()
-    db.refresh(customer)
+    await db.flush()
+    # Perubahan saldo dicatat di ledger (selisihnya), bukan ditimpa langsung
+    if await wallet_ledger.set_balance(db, id_customer, data.saldo or 0) is None:
+        raise HTTPException(400, "Saldo tidak boleh negatif")
+
+    await db.commit()
+    forget_principal(ROLE_USER, id_customer)
+    await db.refresh(customer)
     return customer
 
 
 @router.delete("/customer/{id_customer}")
-def delete_customer(id_customer: int, db: Session = Depends(get_db)):
-    customer = db.query(models.Customer).filter(models.Customer.id_customer == id_customer).first()
+async def delete_customer(id_customer: int, db: AsyncSession = Depends(get_db)):
+    customer = await db.get(models.Customer, id_customer)
     if not customer:
         raise HTTPException(404, "Customer not found")
 
-    db.delete(customer)
-    db.commit()
+    await db.delete(customer)
+    await db.commit()
+    forget_principal(ROLE_USER, id_customer)
     return {"message": "Customer deleted successfully"}
 
 
@@ -56,70 +89,201 @@ def delete_customer(id_customer: int, db: Session = Depends(get_db)):
 # ==============================================================
 
 @router.post("/admin", response_model=schemas.Admin)
-def create_admin(admin: schemas.AdminCreate, db: Session = Depends(get_db)):
+async def create_admin(admin: schemas.AdminCreate, db: AsyncSession = Depends(get_db)):
     new = models.Admin(**admin.dict())
     db.add(new)
-    db.commit()
-    db.refresh(new)
+    await db.commit()
+    await db.refresh(new)
     return new
 
 
 @router.get("/admin", response_model=list[schemas.Admin])
-def get_admin(db: Session = Depends(get_db)):
-    return db.query(models.Admin).all()
+async def get_admin(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    email: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    filters = []
+    if email is not None:
+        filters.append(models.Admin.email == email)
+    return await list_page(db, models.Admin, schemas.Admin,
+                           limit=limit, cursor=cursor, fields=fields, filters=filters)
 
 
 @router.put("/admin/{id_admin}", response_model=schemas.Admin)
-def update_admin(id_admin: int, data: schemas.AdminCreate, db: Session = Depends(get_db)):
-    admin = db.query(models.Admin).filter(models.Admin.id_admin == id_admin).first()
+async def update_admin(id_admin: int, data: schemas.AdminCreate, db: AsyncSession = Depends(get_db)):
+    admin = await db.get(models.Admin, id_admin)
     if not admin:
         raise HTTPException(404, "Admin not found")
 
     for key, value in data.dict().items():
         setattr(admin, key, value)
 
-    db.commit()
-    db.refresh(admin)
+    await db.commit()
+    forget_principal(ROLE_ADMIN, id_admin)
+    await db.refresh(admin)
     return admin
 
 
 @router.delete("/admin/{id_admin}")
-def delete_admin(id_admin: int, db: Session = Depends(get_db)):
-    admin = db.query(models.Admin).filter(models.Admin.id_admin == id_admin).first()
+async def delete_admin(id_admin: int, db: AsyncSession = Depends(get_db)):
+    admin = await db.get(models.Admin, id_admin)
     if not admin:
         raise HTTPException(404, "Admin not found")
 
-    db.delete(admin)
-    db.commit()
+    await db.delete(admin)
+    await db.commit()
+    forget_principal(ROLE_ADMIN, id_admin)
     return {"message": "Admin deleted successfully"}
 
 
+# ==============================================================
+#   BULK PROVISIONING (JSON array atau CSV)
+# ==============================================================
+# Body: JSON array, atau CSV dengan header kolom (Content-Type: text/csv).
+# FK dicek dengan satu query, insert/update dikirim sebagai executemany
+# dalam satu transaksi; cache state slot/gate di-reset sekali di akhir.
+
+MAX_BULK_ROWS = 10000
+
+async def _read_bulk_rows(request: Request, item_schema: type[BaseModel]) -> list:
+    """Parse a JSON array or CSV body into validated items"""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("text/csv"):
+            lines = []
+            async for chunk in request.stream():
+                lines.append(chunk)
+            reader = csv.DictReader(io.StringIO(b"".join(lines).decode("utf-8-sig")))
+            # Sel kosong = kolom tidak dikirim
+            raw = [{key: value for key, value in row.items() if value not in ("", None)} for row in reader]
+        else:
+            raw = await request.json()
+    except (UnicodeDecodeError, ValueError, csv.Error):
+        raise HTTPException(400, "Body harus JSON array atau CSV")
+    if not isinstance(raw, list):
+        raise HTTPException(400, "Body harus JSON array atau CSV")
+    if len(raw) > MAX_BULK_ROWS:
+        raise HTTPException(400, f"Maksimal {MAX_BULK_ROWS} baris per request")
+
+    try:
+        return TypeAdapter(list[item_schema]).validate_python(raw)
+    except ValidationError as e:
+        raise HTTPException(422, e.errors(include_url=False))
+
+async def _check_mikrokontroler(db: AsyncSession, items: list) -> None:
+    wanted = {item.id_mikrokontroler for item in items}
+    found = set((await db.scalars(
+        select(models.Mikrokontroler.id_mikrokontroler).where(models.Mikrokontroler.id_mikrokontroler.in_(wanted))
+    )).all())
+    missing = sorted(wanted - found)
+    if missing:
+        raise HTTPException(404, f"Mikrokontroler tidak ditemukan: {missing}")
+
+async def _bulk_upsert(db: AsyncSession, model, items: list) -> schemas.BulkResult:
+    """Insert items without/unknown primary key, update the rest (only the fields sent)"""
+    key = model.__mapper__.primary_key[0].name
+    ids = [getattr(item, key) for item in items if getattr(item, key) is not None]
+    if len(ids) != len(set(ids)):
+        raise HTTPException(400, f"{key} duplikat dalam satu request")
+
+    existing = set()
+    if ids:
+        existing = set((await db.scalars(
+            select(getattr(model, key)).where(getattr(model, key).in_(ids))
+        )).all())
+
+    inserts = []
+    updates = []
+    for item in items:
+        if getattr(item, key) in existing:
+            fields = item.model_dump(exclude_unset=True)
+            if len(fields) > 1:
+                updates.append(fields)
+        else:
+            inserts.append(item.model_dump(exclude_none=True))
+
+    # executemany; baris dengan & tanpa primary key dikirim terpisah (kolom harus seragam)
+    for has_key in (True, False):
+        rows = [row for row in inserts if (key in row) == has_key]
+        if rows:
+            await db.execute(insert(model), rows)
+    if updates:
+        await db.execute(update(model), updates)
+    return schemas.BulkResult(created=len(inserts), updated=len(updates))
+
 # ==============================================================
 #   MIKROKONTROLER CRUD
 # ==============================================================
 
 @router.post("/mikrokontroler", response_model=schemas.Mikrokontroler)
-def create_mikrokontroler(db: Session = Depends(get_db)):
+async def create_mikrokontroler(db: AsyncSession = Depends(get_db)):
     new = models.Mikrokontroler()
     db.add(new)
-    db.commit()
-    db.refresh(new)
+    await db.commit()
+    await db.refresh(new, ["slot", "aktuator"])
     return new
 
 
+@router.post("/mikrokontroler/bulk", response_model=schemas.BulkResult)
+async def bulk_create_mikrokontroler(request: Request, db: AsyncSession = Depends(get_db)):
+    items = await _read_bulk_rows(request, schemas.MikrokontrolerBulkItem)
+    result = await _bulk_upsert(db, models.Mikrokontroler, items)
+    await db.commit()
+    return result
+
+
+# ?include= -> relasi pada response /mikrokontroler
+MIKROKONTROLER_INCLUDES = {
+    "slots": models.Mikrokontroler.slot,
+    "actuators": models.Mikrokontroler.aktuator,
+}
+
+# Schema response per kombinasi include: hanya berisi relasi yang benar-benar dimuat
+MIKROKONTROLER_SCHEMAS = {
+    frozenset(): schemas.MikrokontrolerRef,
+    frozenset({"slots"}): schemas.MikrokontrolerWithSlots,
+    frozenset({"actuators"}): schemas.MikrokontrolerWithAktuator,
+    frozenset({"slots", "actuators"}): schemas.Mikrokontroler,
+}
+
 @router.get("/mikrokontroler", response_model=list[schemas.Mikrokontroler])
-def get_mikrokontroler(db: Session = Depends(get_db)):
-    return db.query(models.Mikrokontroler).all()
+async def get_mikrokontroler(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: str = "slots,actuators",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List microcontrollers. `?include=slots,actuators` (default keduanya) memilih
+    relasi yang dimuat; `?include=` kosong hanya mengembalikan id.
+    Query tetap: 1 + 1 per relasi yang di-include, berapa pun jumlah mikrokontroler.
+    """
+    names = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = names - MIKROKONTROLER_INCLUDES.keys()
+    if unknown:
+        raise HTTPException(400, f"include tidak dikenal: {', '.join(sorted(unknown))} (pilihan: slots, actuators)")
+
+    # Relasi yang diminta dimuat eager dengan selectin (lazy load tidak tersedia pada
+    # AsyncSession); relasi lain raise bila tersentuh, dan schema-nya memang tidak memuatnya
+    options = [selectinload(MIKROKONTROLER_INCLUDES[name]) for name in sorted(names)]
+    options.append(raiseload("*"))
+    return await list_page(db, models.Mikrokontroler, MIKROKONTROLER_SCHEMAS[frozenset(names)],
+                           limit=limit, cursor=cursor, fields=fields, options=options)
 
 
 @router.delete("/mikrokontroler/{id_mikrokontroler}")
-def delete_mikrokontroler(id_mikrokontroler: int, db: Session = Depends(get_db)):
-    mc = db.query(models.Mikrokontroler).filter(models.Mikrokontroler.id_mikrokontroler == id_mikrokontroler).first()
+async def delete_mikrokontroler(id_mikrokontroler: int, db: AsyncSession = Depends(get_db)):
+    mc = await db.get(models.Mikrokontroler, id_mikrokontroler)
     if not mc:
         raise HTTPException(404, "Mikrokontroler not found")
 
-    db.delete(mc)
-    db.commit()
+    await db.delete(mc)
+    await db.commit()
+    state_cache.invalidate()
     return {"message": "Mikrokontroler deleted successfully"}
 
 
@@ -128,57 +292,82 @@ def delete_mikrokontroler(id_mikrokontroler: int, db: Session = Depends(get_db))
 # ==============================================================
 
 @router.post("/slot", response_model=schemas.Slot)
-def create_slot(slot: schemas.SlotCreate, db: Session = Depends(get_db)):
+async def create_slot(slot: schemas.SlotCreate, db: AsyncSession = Depends(get_db)):
     # cek foreign key
-    mc = db.query(models.Mikrokontroler).filter(
-        models.Mikrokontroler.id_mikrokontroler == slot.id_mikrokontroler
-    ).first()
+    mc = await db.get(models.Mikrokontroler, slot.id_mikrokontroler)
 
     if not mc:
         raise HTTPException(404, "Mikrokontroler not found")
 
-    new = models.Slot(**slot.dict())
+    new = models.Slot(**slot.dict(exclude_none=True))
     db.add(new)
-    db.commit()
-    db.refresh(new)
+    await db.commit()
+    state_cache.invalidate()
+    await db.refresh(new)
     return new
 
 
+@router.post("/slot/bulk", response_model=schemas.BulkResult)
+async def bulk_upsert_slot(request: Request, db: AsyncSession = Depends(get_db)):
+    items = await _read_bulk_rows(request, schemas.SlotBulkItem)
+    await _check_mikrokontroler(db, items)
+    result = await _bulk_upsert(db, models.Slot, items)
+    await db.commit()
+    state_cache.invalidate()
+    return result
+
+
 @router.get("/slot", response_model=list[schemas.Slot])
-def get_slot(db: Session = Depends(get_db)):
-    return db.query(models.Slot).all()
+async def get_slot(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    id_mikrokontroler: Optional[int] = None,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    filters = []
+    if id_mikrokontroler is not None:
+        filters.append(models.Slot.id_mikrokontroler == id_mikrokontroler)
+    if status is not None:
+        # ?status=alert -> WHERE state IN (...) lewat index ix_slot_condition_state
+        if status not in slot_status.STATES_BY_STATUS:
+            raise HTTPException(400, f"status harus salah satu dari: {', '.join(slot_status.STATUSES)}")
+        filters.append(models.Slot.state.in_(slot_status.STATES_BY_STATUS[status]))
+    return await list_page(db, models.Slot, schemas.Slot,
+                           limit=limit, cursor=cursor, fields=fields, filters=filters)
 
 @router.put("/slot/{id_slot}", response_model=schemas.Slot)
-def update_slot(id_slot: int, data: schemas.SlotCreate, db: Session = Depends(get_db)):
-    slot = db.query(models.Slot).filter(models.Slot.id_slot == id_slot).first()
+async def update_slot(id_slot: int, data: schemas.SlotCreate, db: AsyncSession = Depends(get_db)):
+    slot = await db.get(models.Slot, id_slot)
     if not slot:
         raise HTTPException(404, "Slot not found")
 
     # cek mikrokontroler jika ingin diupdate
-    mc = db.query(models.Mikrokontroler).filter(
-        models.Mikrokontroler.id_mikrokontroler == data.id_mikrokontroler
-    ).first()
+    mc = await db.get(models.Mikrokontroler, data.id_mikrokontroler)
 
     if not mc:
         raise HTTPException(404, "Mikrokontroler tidak ditemukan")
 
-    # update semua field
-    for key, value in data.dict().items():
+    # update semua field (bookable hanya bila dikirim)
+    for key, value in data.dict(exclude_none=True).items():
         setattr(slot, key, value)
 
-    db.commit()
-    db.refresh(slot)
+    await db.commit()
+    state_cache.invalidate()
+    await db.refresh(slot)
     return slot
 
 
 @router.delete("/slot/{id_slot}")
-def delete_slot(id_slot: int, db: Session = Depends(get_db)):
-    slot = db.query(models.Slot).filter(models.Slot.id_slot == id_slot).first()
+async def delete_slot(id_slot: int, db: AsyncSession = Depends(get_db)):
+    slot = await db.get(models.Slot, id_slot)
     if not slot:
         raise HTTPException(404, "Slot not found")
 
-    db.delete(slot)
-    db.commit()
+    await db.delete(slot)
+    await db.commit()
+    state_cache.invalidate()
     return {"message": "Slot deleted successfully"}
 
 
@@ -187,36 +376,53 @@ def delete_slot(id_slot: int, db: Session = Depends(get_db)):
 # ==============================================================
 
 @router.post("/aktuator", response_model=schemas.Aktuator)
-def create_aktuator(aktuator: schemas.AktuatorCreate, db: Session = Depends(get_db)):
+async def create_aktuator(aktuator: schemas.AktuatorCreate, db: AsyncSession = Depends(get_db)):
     # cek foreign key
-    mc = db.query(models.Mikrokontroler).filter(
-        models.Mikrokontroler.id_mikrokontroler == aktuator.id_mikrokontroler
-    ).first()
+    mc = await db.get(models.Mikrokontroler, aktuator.id_mikrokontroler)
 
     if not mc:
         raise HTTPException(404, "Mikrokontroler not found")
 
     new = models.Aktuator(**aktuator.dict())
     db.add(new)
-    db.commit()
-    db.refresh(new)
+    await db.commit()
+    state_cache.invalidate()
+    await db.refresh(new)
     return new
 
 
+@router.post("/aktuator/bulk", response_model=schemas.BulkResult)
+async def bulk_upsert_aktuator(request: Request, db: AsyncSession = Depends(get_db)):
+    items = await _read_bulk_rows(request, schemas.AktuatorBulkItem)
+    await _check_mikrokontroler(db, items)
+    result = await _bulk_upsert(db, models.Aktuator, items)
+    await db.commit()
+    state_cache.invalidate()
+    return result
+
+
 @router.get("/aktuator", response_model=list[schemas.Aktuator])
-def get_aktuator(db: Session = Depends(get_db)):
-    return db.query(models.Aktuator).all()
+async def get_aktuator(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    id_mikrokontroler: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    filters = []
+    if id_mikrokontroler is not None:
+        filters.append(models.Aktuator.id_mikrokontroler == id_mikrokontroler)
+    return await list_page(db, models.Aktuator, schemas.Aktuator,
+                           limit=limit, cursor=cursor, fields=fields, filters=filters)
 
 @router.put("/aktuator/{id_aktuator}", response_model=schemas.Aktuator)
-def update_aktuator(id_aktuator: int, data: schemas.AktuatorCreate, db: Session = Depends(get_db)):
-    aktuator = db.query(models.Aktuator).filter(models.Aktuator.id_aktuator == id_aktuator).first()
+async def update_aktuator(id_aktuator: int, data: schemas.AktuatorCreate, db: AsyncSession = Depends(get_db)):
+    aktuator = await db.get(models.Aktuator, id_aktuator)
     if not aktuator:
         raise HTTPException(404, "Aktuator not found")
 
     # cek FK mikrokontroler
-    mc = db.query(models.Mikrokontroler).filter(
-        models.Mikrokontroler.id_mikrokontroler == data.id_mikrokontroler
-    ).first()
+    mc = await db.get(models.Mikrokontroler, data.id_mikrokontroler)
 
     if not mc:
         raise HTTPException(404, "Mikrokontroler tidak ditemukan")
@@ -225,19 +431,21 @@ def update_aktuator(id_aktuator: int, data: schemas.AktuatorCreate, db: Session
     for key, value in data.dict().items():
         setattr(aktuator, key, value)
 
-    db.commit()
-    db.refresh(aktuator)
+    await db.commit()
+    state_cache.invalidate()
+    await db.refresh(aktuator)
     return aktuator
 
 
 @router.delete("/aktuator/{id_aktuator}")
-def delete_aktuator(id_aktuator: int, db: Session = Depends(get_db)):
-    akt = db.query(models.Aktuator).filter(models.Aktuator.id_aktuator == id_aktuator).first()
+async def delete_aktuator(id_aktuator: int, db: AsyncSession = Depends(get_db)):
+    akt = await db.get(models.Aktuator, id_aktuator)
     if not akt:
         raise HTTPException(404, "Aktuator not found")
 
-    db.delete(akt)
-    db.commit()
+    await db.delete(akt)
+    await db.commit()
+    state_cache.invalidate()
     return {"message": "Aktuator deleted successfully"}
 
 # ==============================================================
@@ -245,54 +453,132 @@ def delete_aktuator(id_aktuator: int, db: Session = Depends(get_db)):
 # ==============================================================
 
 @router.get("/booking", response_model=list[schemas.Booking])
-def get_booking(db: Session = Depends(get_db)):
-    return db.query(models.Booking).all()
+async def get_booking(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    id_customer: Optional[int] = None,
+    id_parkir: Optional[int] = None,
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # from/to memfilter waktu_booking (from inklusif, to eksklusif)
+    filters = []
+    if status is not None:
+        filters.append(models.Booking.status == status)
+    if id_customer is not None:
+        filters.append(models.Booking.id_customer == id_customer)
+    if id_parkir is not None:
+        filters.append(models.Booking.id_parkir == id_parkir)
+    if date_from is not None:
+        filters.append(models.Booking.waktu_booking >= date_from)
+    if date_to is not None:
+        filters.append(models.Booking.waktu_booking < date_to)
+    return await list_page(db, models.Booking, schemas.Booking,
+                           limit=limit, cursor=cursor, fields=fields, filters=filters)
+
+# Kolom export booking (urutan = header CSV)
+EXPORT_BOOKING_COLUMNS = (
+    "id_booking", "id_customer", "id_parkir", "status",
+    "waktu_booking", "waktu_masuk", "waktu_keluar", "biaya", "durasi_jam",
+)
+EXPORT_BATCH_SIZE = 1000
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def _export_booking_rows(fmt: str, filters: list):
+    """Yield the export in chunks, reading through a server-side cursor"""
+    columns = [getattr(models.Booking, name) for name in EXPORT_BOOKING_COLUMNS]
+    query = (
+        select(*columns)
+        .where(*filters)
+        .order_by(models.Booking.id_booking)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    if fmt == "csv":
+        yield ",".join(EXPORT_BOOKING_COLUMNS) + "\r\n"
+
+    # Session sendiri: session dari Depends sudah ditutup saat body di-stream
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buffer)
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(EXPORT_BOOKING_COLUMNS, row)), default=datetime.isoformat))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+@router.get("/booking/export")
+async def export_booking(
+    format: str = "ndjson",
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+):
+    """
+    Stream bookings as NDJSON (default) or CSV, ordered by id_booking.
+    from/to memfilter waktu_booking (from inklusif, to eksklusif).
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(400, "format harus ndjson atau csv")
+
+    filters = []
+    if date_from is not None:
+        filters.append(models.Booking.waktu_booking >= date_from)
+    if date_to is not None:
+        filters.append(models.Booking.waktu_booking < date_to)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_booking_rows(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="booking.{format}"'}
+    )
 
 @router.post("/booking", response_model=schemas.Booking)
-def create_booking(data: schemas.BookingCreate, db: Session = Depends(get_db)):
+async def create_booking(data: schemas.BookingCreate, db: AsyncSession = Depends(get_db)):
     # cek foreign key parkir
-    parkir = db.query(models.Slot).filter(
-        models.Slot.id_slot == data.id_parkir
-    ).first()
+    parkir = await db.get(models.Slot, data.id_parkir)
     if not parkir:
         raise HTTPException(404, "Parkir (Mikrokontroler) tidak ditemukan")
 
     # cek foreign key customer
-    customer = db.query(models.Customer).filter(
-        models.Customer.id_customer == data.id_customer
-    ).first()
+    customer = await db.get(models.Customer, data.id_customer)
     if not customer:
         raise HTTPException(404, "Customer tidak ditemukan")
 
     booking = models.Booking(**data.dict())
     db.add(booking)
-    db.commit()
-    db.refresh(booking)
+    await db.commit()
+    await db.refresh(booking)
     return booking
 
 @router.put("/booking/{id_booking}", response_model=schemas.Booking)
-def update_booking(id_booking: int, data: schemas.BookingUpdate, db: Session = Depends(get_db)):
-    booking = db.query(models.Booking).filter(
-        models.Booking.id_booking == id_booking
-    ).first()
+async def update_booking(id_booking: int, data: schemas.BookingUpdate, db: AsyncSession = Depends(get_db)):
+    booking = await db.get(models.Booking, id_booking)
 
     if not booking:
         raise HTTPException(404, "Booking tidak ditemukan")
 
     # cek id_parkir jika ingin diupdate
     if data.id_parkir is not None:
-        parkir = db.query(models.Slot).filter(
-            models.Slot.id_slot == data.id_parkir
-        ).first()
+        parkir = await db.get(models.Slot, data.id_parkir)
         if not parkir:
             raise HTTPException(404, "Parkir tidak ditemukan")
         booking.id_parkir = data.id_parkir
 
     # cek id_customer jika ingin diupdate
     if data.id_customer is not None:
-        cust = db.query(models.Customer).filter(
-            models.Customer.id_customer == data.id_customer
-        ).first()
+        cust = await db.get(models.Customer, data.id_customer)
         if not cust:
             raise HTTPException(404, "Customer tidak ditemukan")
         booking.id_customer = data.id_customer
@@ -301,19 +587,17 @@ def update_booking(id_booking: int, data: schemas.BookingUpdate, db: Session = D
     if data.status is not None:
         booking.status = data.status
 
-    db.commit()
-    db.refresh(booking)
+    await db.commit()
+    await db.refresh(booking)
     return booking
 
 @router.delete("/booking/{id_booking}")
-def delete_booking(id_booking: int, db: Session = Depends(get_db)):
-    booking = db.query(models.Booking).filter(
-        models.Booking.id_booking == id_booking
-    ).first()
+async def delete_booking(id_booking: int, db: AsyncSession = Depends(get_db)):
+    booking = await db.get(models.Booking, id_booking)
 
     if not booking:
         raise HTTPException(404, "Booking tidak ditemukan")
 
-    db.delete(booking)
-    db.commit()
+    await db.delete(booking)
+    await db.commit()
     return {"message": "Booking deleted successfully"}
\ No newline at end of file
@@ -1,57 +1,128 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
-from backend.database import get_db
+from backend.database import SessionLocal, get_db
 import backend.models as models, backend.schemas as schemas
+import backend.gate_commands as gate_commands
+import backend.state_cache as state_cache
 
 router = APIRouter()
 
+# Batas maksimal long-poll /instruction (detik)
+MAX_INSTRUCTION_WAIT = 30
+
 # ============================
 #   ESP32 → Backend (POST)
 # ============================
 @router.post("/update")
-async def update_from_esp32(data: schemas.FromESP32_detection, db: Session = Depends(get_db)):
+async def update_from_esp32(data: schemas.FromESP32_detection, db: AsyncSession = Depends(get_db)):
     print("(Slot) Received from ESP32:", data.dict())
 
-    for slot_update in data.slots:
-        slot = db.query(models.Slot).filter(models.Slot.id_slot == slot_update.id_slot).first()
-        if slot:
-            slot.occupied = slot_update.occupied
-            slot.alarmed = slot_update.alarmed
-    
+    # State terakhir per slot diambil dari cache (tanpa SELECT per slot); id duplikat -> yang terakhir dipakai
+    last_known = {slot.id_slot: slot for slot in await state_cache.get_slots(db)}
+    received = {
+        slot_update.id_slot: slot_update
+        for slot_update in data.slots
+        if slot_update.id_slot in last_known
+    }
+
+    # Hanya tulis slot yang occupied/alarmed-nya benar-benar berubah
+    changed = {
+        id_slot: slot_update
+        for id_slot, slot_update in received.items()
+        if (last_known[id_slot].occupied, last_known[id_slot].alarmed) != (slot_update.occupied, slot_update.alarmed)
+    }
+
     # Only reset gates that were opened by hardware (not by frontend)
     # Frontend sets kondisi_buka to True, hardware should only reset it after gate operation completes
     # We don't reset gates here anymore - let hardware send gate status via update-gate endpoint
     # This prevents race condition where frontend sets gate to open but hardware resets it before gate opens
 
-    db.commit()
+    # Frame yang sama dengan state terakhir tidak menyentuh database sama sekali
+    if changed:
+        # Bulk UPDATE by primary key: satu executemany dalam satu transaksi
+        await db.execute(
+            update(models.Slot),
+            [
+                {"id_slot": id_slot, "occupied": slot_update.occupied, "alarmed": slot_update.alarmed}
+                for id_slot, slot_update in changed.items()
+            ]
+        )
+        await db.commit()
+        for slot_update in changed.values():
+            state_cache.set_slot(slot_update.id_slot, occupied=slot_update.occupied, alarmed=slot_update.alarmed)
 
-    return {"status": "OK", "saved_slot": len(data.slots)}
+    return {
+        "status": "OK",
+        "saved_slot": len(data.slots),
+        "changed": len(changed),
+        "unchanged": len(received) - len(changed)
+    }
 
 @router.post("/update-gate")
-async def update_gate_from_esp32(data: schemas.FromESP33_gate, db: Session = Depends(get_db)):
+async def update_gate_from_esp32(data: schemas.FromESP33_gate, db: AsyncSession = Depends(get_db)):
     print("(Gate) Received from ESP32:", data.dict())
 
-    for gate_update in data.gates:
-        gate = db.query(models.Aktuator).filter(models.Aktuator.id_aktuator == gate_update.id_gate).first()
+    last_known = {gate.id_aktuator: gate for gate in await state_cache.get_gates(db)}
 
-        if gate:
-            gate.aksi_gate = gate_update.condition
-            # Reset kondisi_buka to False only after hardware confirms gate operation completed
-            # This allows frontend commands to have priority and gate stays open until hardware confirms closure
-            if gate_update.condition == "closed":
-                gate.kondisi_buka = False
-
-    db.commit()
-    return {"status": "OK", "saved_gates": len(data.gates)}
+    changed = {}
+    unchanged = 0
+    for gate_update in data.gates:
+        gate = last_known.get(gate_update.id_gate)
+        if not gate:
+            continue
+
+        fields = {}
+        if gate.aksi_gate != gate_update.condition:
+            fields["aksi_gate"] = gate_update.condition
+        # Reset kondisi_buka to False only after hardware confirms gate operation completed
+        # This allows frontend commands to have priority and gate stays open until hardware confirms closure
+        if gate_update.condition == "closed" and gate.kondisi_buka:
+            fields["kondisi_buka"] = False
+
+        if fields:
+            changed[gate_update.id_gate] = fields
+        else:
+            unchanged += 1
+
+    if changed or data.acks:
+        for id_gate, fields in changed.items():
+            await db.execute(
+                update(models.Aktuator)
+                .where(models.Aktuator.id_aktuator == id_gate)
+                .values(**fields)
+            )
+        # Ack perintah gate yang sudah dieksekusi ESP32 (lihat gate_commands.py)
+        await gate_commands.acknowledge(db, data.acks)
+        await db.commit()
+        for id_gate, fields in changed.items():
+            state_cache.set_gate(id_gate, **fields)
+        gate_commands.acked(data.acks)
+
+    return {
+        "status": "OK",
+        "saved_gates": len(data.gates),
+        "changed": len(changed),
+        "unchanged": unchanged,
+        "acked": len(data.acks)
+    }
 
 # ============================
 #   Backend → ESP32 (GET)
 # ============================
-@router.get("/instruction", response_model=schemas.ToESP32)
-def send_instruction_to_esp32(db: Session = Depends(get_db)):
-    db_slots = db.query(models.Slot).all()
+async def build_instruction() -> schemas.ToESP32:
+    """Build the ESP32 instruction set from the state cache and the gate command queue"""
+    # Ambil versi sebelum data: bila ada perubahan di tengah, ESP32 akan
+    # menerima versi lama dan langsung mengambil ulang pada poll berikutnya
+    version = state_cache.get_version()
+    async with SessionLocal() as db:
+        db_slots = await state_cache.get_slots(db)
+        db_gates = await state_cache.get_gates(db)
+        pending = await gate_commands.get_pending(db)
+
     slots = [
         schemas.SlotData(
             id_slot= slot.id_slot,
@@ -62,16 +133,40 @@ def send_instruction_to_esp32(db: Session = Depends(get_db)):
     ]
 
     # Hanya mengambil aktuator yang usable
-    db_gates = db.query(models.Aktuator).filter(models.Aktuator.usable == True).all()
     gates = [
         schemas.GateData(
             id_aktuator= gate.id_aktuator,
             buka= gate.kondisi_buka  # Mengambil kondisi_buka dari database
         )
-        for gate in db_gates
+        for gate in db_gates if gate.usable
+    ]
+
+    commands = [
+        schemas.GateCommandData(seq=command.seq, id_aktuator=command.id_aktuator, perintah=command.perintah)
+        for command in pending
     ]
 
-    return schemas.ToESP32(slots=slots, gates=gates)
+    return schemas.ToESP32(slots=slots, gates=gates, version=version, commands=commands)
+
+async def has_pending_commands() -> bool:
+    async with SessionLocal() as db:
+        return bool(await gate_commands.get_pending(db))
+
+@router.get("/instruction", response_model=schemas.ToESP32)
+async def send_instruction_to_esp32(since: Optional[int] = None, wait: float = 0):
+    """
+    Instruction for ESP32.
+    Long-poll: `?since=<version>&wait=<detik>` menunggu sampai instruksi
+    berubah dari versi `since`, atau mengembalikan 304 bila timeout.
+    `commands` berisi semua perintah gate yang belum di-ack; selama masih ada,
+    response dikirim tanpa menunggu.
+    """
+    if since is not None and wait > 0 and not await has_pending_commands():
+        changed = await state_cache.wait_for_version(since, min(wait, MAX_INSTRUCTION_WAIT))
+        if not changed:
+            return Response(status_code=304)
+
+    return await build_instruction()
 
 
 @router.get("/instruction-test", response_model=schemas.ToESP32)
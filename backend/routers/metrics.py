@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+
+import backend.gate_commands as gate_commands
+from backend.database import DB_READ_YOUR_WRITES_SECONDS, engine, pool_status, read_engine, replica_lag_seconds
+
+router = APIRouter()
+
+# ============================
+#   Database connection pool
+# ============================
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics():
+    """
+    Connection pool usage of this worker process.
+    checked_out / overflow mendekati batas (utilization -> 1) atau `timeouts`
+    yang naik berarti pool terlalu kecil untuk jumlah request bersamaan.
+    """
+    status = pool_status()
+    if read_engine is not engine:
+        status["replica"] = pool_status(read_engine)
+    return status
+
+# ============================
+#   Read replica
+# ============================
+@router.get("/metrics/db-replica")
+async def get_db_replica_metrics():
+    """Replication lag of the read replica (`lag_seconds` null bila tidak diketahui)"""
+    if read_engine is engine:
+        return {"enabled": False, "lag_seconds": None}
+    return {
+        "enabled": True,
+        "lag_seconds": await replica_lag_seconds(),
+        "read_your_writes_seconds": DB_READ_YOUR_WRITES_SECONDS
+    }
+
+# ============================
+#   Gate command queue
+# ============================
+@router.get("/metrics/gate-commands")
+async def get_gate_command_metrics():
+    """
+    Gate command queue of this worker: pending/acked/expired counts and the
+    open-to-ack latency (scan -> ESP32 ack) over recent commands.
+    """
+    return gate_commands.stats()
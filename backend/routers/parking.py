@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+import asyncio
+import json
 import secrets
 
 import backend.models as models
 import backend.schemas as schemas
-from backend.database import get_db
+import backend.slot_status as slot_status
+import backend.state_cache as state_cache
+from backend import booking_expiry
+from backend.database import SessionLocal, get_db, get_read_db
+from backend.http_cache import json_with_etag
+from backend.idempotency import IdempotencyKey, idempotency_key
+from backend.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_datetime
+from backend.security import Principal, get_current_user
 
 router = APIRouter()
 
@@ -14,6 +26,8 @@ router = APIRouter()
 QR_TTL_MINUTES = 30
 FIRST_HOUR_RATE = 10000
 EXTRA_HOUR_RATE = 5000
+# Interval komentar keep-alive pada stream SSE (detik)
+SSE_KEEPALIVE_SECONDS = 15
 
 # GMT+7 timezone (WIB - Western Indonesian Time)
 GMT7 = timezone(timedelta(hours=7))
@@ -44,93 +58,93 @@ def calculate_parking_cost(start_time: datetime, end_time: Optional[datetime] =
     cost = FIRST_HOUR_RATE + max(0, hours - 1) * EXTRA_HOUR_RATE
     return {"hours": hours, "cost": cost}
 
-def get_current_user_id(token: Optional[str] = None) -> Optional[int]:
-    """Extract user ID from token (simplified - in production use proper JWT)"""
-    # For now, we'll use a simple approach
-    # In production, decode JWT token properly
-    if not token:
-        return None
-    # Simple token format: "token-{user_id}"
-    try:
-        if token.startswith("token-"):
-            return int(token.split("token-")[1])
-        # Try to extract from Authorization header format
-        if "Bearer" in token:
-            token = token.replace("Bearer", "").strip()
-        # For demo, accept any numeric ID
-        return int(token) if token.isdigit() else None
-    except:
-        return None
+def spot_payload(slot: state_cache.SlotState) -> dict:
+    """Format one slot state as a spot for the frontend"""
+    # Availability is driven only by `booked` (business rule)
+    is_available = not slot.booked
 
-def get_user_from_request(authorization: Optional[str] = None, db: Session = Depends(get_db)):
-    """Get user from authorization header"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    user_id = get_current_user_id(authorization.replace("Bearer ", "").strip() if authorization else None)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    user = db.query(models.Customer).filter(models.Customer.id_customer == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
+    return {
+        "id": f"S{slot.id_slot}",
+        "name": f"Slot {slot.id_slot}",
+        "code": f"P-{slot.id_slot}",
+        "level": 1,
+        "isAvailable": is_available,
+        "bookable": slot.bookable,  # kolom slot_condition.bookable; dipakai isBookableSpot di frontend
+        "status": slot.status,  # tabel status bersama (backend/slot_status.py)
+        "ratePerHour": FIRST_HOUR_RATE
+    }
+
+async def load_spots() -> list[dict]:
+    """Load all spots with a short-lived session (for code outside a request)"""
+    async with SessionLocal() as db:
+        return [spot_payload(slot) for slot in await state_cache.get_slots(db)]
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.get("/parking/spots")
-def get_spots(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_spots(
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all parking spots with availability status"""
-    # Get all slots
-    slots = db.query(models.Slot).all()
-    
-    spots = []
-    for slot in slots:
-        # Availability is driven only by `booked` (business rule)
-        is_available = not slot.booked
+    # Get all slots (served from the in-process cache)
+    slots = await state_cache.get_slots(db)
+    return {"spots": [spot_payload(slot) for slot in slots]}
 
-        # Derive human-readable status based on the requested combinations
-        if not slot.booked and not slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "available"
-        elif slot.booked and not slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "booked"
-        elif slot.booked and slot.confirmed and not slot.occupied and not slot.alarmed:
-            status = "confirmed"
-        elif slot.booked and slot.confirmed and slot.occupied and not slot.alarmed:
-            status = "occupied"
-        elif (not slot.booked) and (not slot.confirmed) and slot.occupied and slot.alarmed:
-            status = "alert"
-        else:
-            status = "unknown"
+@router.get("/parking/summary")
+async def get_spot_summary(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Count of spots per status (from the in-process cache), with ETag"""
+    slots = await state_cache.get_slots(db)
+    summary = slot_status.count_by_status(slot.state for slot in slots)
+    # Angka di hero frontend: slot bookable yang belum di-booking (sama dengan spot isAvailable)
+    summary["bookableAvailable"] = sum(1 for slot in slots if slot.bookable and not slot.booked)
+    return json_with_etag(request, {"summary": summary})
 
-        # Get mikrokontroler info
-        mikrokontroler = db.query(models.Mikrokontroler).filter(
-            models.Mikrokontroler.id_mikrokontroler == slot.id_mikrokontroler
-        ).first()
-        
-        spots.append({
-            "id": f"S{slot.id_slot}",
-            "name": f"Slot {slot.id_slot}",
-            "code": f"P-{slot.id_slot}",
-            "level": 1,
-            "isAvailable": is_available,
-            "status": status,
-            "ratePerHour": FIRST_HOUR_RATE
-        })
-    
-    return {"spots": spots}
+@router.get("/parking/spots/stream")
+async def stream_spots(request: Request):
+    """Stream spot status as Server-Sent Events: one snapshot, then per-slot deltas"""
+    # Subscribe sebelum snapshot supaya tidak ada perubahan yang terlewat
+    queue = state_cache.subscribe()
+
+    async def event_stream():
+        try:
+            spots = await load_spots()
+            yield sse_event("snapshot", {"spots": spots})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Komentar SSE untuk menjaga koneksi (proxy/cloudflare)
+                    yield ": keepalive\n\n"
+                    continue
+                if event is state_cache.RESET:
+                    spots = await load_spots()
+                    yield sse_event("snapshot", {"spots": spots})
+                else:
+                    yield sse_event("spot", spot_payload(event))
+        finally:
+            state_cache.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/parking/book")
-def create_booking(
+async def create_booking(
     booking_data: dict,
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    idem: IdempotencyKey = Depends(idempotency_key)
 ):
-    """Create a new booking"""
-    user = get_user_from_request(authorization, db)
-    
+    """Create a new booking (retry aman dengan header Idempotency-Key)"""
+    if idem.response is not None:
+        return idem.response
     spot_id_str = booking_data.get("spotId")
     if not spot_id_str:
         raise HTTPException(status_code=400, detail="spotId diperlukan")
@@ -141,20 +155,13 @@ def create_booking(
     except:
         raise HTTPException(status_code=400, detail="spotId tidak valid")
     
-    # Check if slot exists and availability based only on `booked`
-    slot = db.query(models.Slot).filter(models.Slot.id_slot == slot_id).first()
-    if not slot:
-        raise HTTPException(status_code=404, detail="Slot tidak ditemukan")
-    
-    # Business rule: cannot book when already booked; occupied/alarmed do not block booking
-    if slot.booked:
-        raise HTTPException(status_code=400, detail="Lahan tidak tersedia")
-    
     # Check for existing active booking
-    existing_booking = db.query(models.Booking).filter(
-        models.Booking.id_customer == user.id_customer,
-        models.Booking.status.in_(["pending", "checked-in"])
-    ).first()
+    existing_booking = (await db.scalars(
+        select(models.Booking).where(
+            models.Booking.id_customer == user.id,
+            models.Booking.status.in_(["pending", "checked-in"])
+        )
+    )).first()
     
     if existing_booking:
         # Check if expired
@@ -162,29 +169,44 @@ def create_booking(
             # For simplicity, allow only one active booking
             raise HTTPException(status_code=400, detail="Masih ada booking aktif")
     
+    # Claim slot atomically: conditional UPDATE, hanya satu request yang menang
+    # Business rule: availability based only on `booked`; occupied/alarmed do not block booking
+    # Slot dengan bookable=False tidak pernah bisa diklaim (aturan dari kolom slot_condition.bookable)
+    claimed = (await db.execute(
+        update(models.Slot)
+        .where(models.Slot.id_slot == slot_id, models.Slot.bookable == True, models.Slot.booked == False)
+        .values(booked=True)
+        .execution_options(synchronize_session=False)
+    )).rowcount
+    
+    if not claimed:
+        await db.rollback()
+        bookable = await db.scalar(select(models.Slot.bookable).where(models.Slot.id_slot == slot_id))
+        if bookable is None:
+            raise HTTPException(status_code=404, detail="Slot tidak ditemukan")
+        if not bookable:
+            raise HTTPException(status_code=400, detail="Slot ini tidak dapat dibooking")
+        raise HTTPException(status_code=400, detail="Lahan tidak tersedia")
+    
     # Generate QR token
     qr = create_qr_token()
     qr_expires_at = get_now_gmt7() + timedelta(minutes=QR_TTL_MINUTES)
     
     # Create booking
     new_booking = models.Booking(
-        id_parkir=slot.id_slot,
-        id_customer=user.id_customer,
+        id_parkir=slot_id,
+        id_customer=user.id,
         status="pending",
         qr_token=qr["token"],
         qr_expires_at=qr_expires_at
     )
     db.add(new_booking)
+    await db.flush()
     
-    # Mark slot as booked
-    slot.booked = True
-    db.commit()
-    db.refresh(new_booking)
-    
-    return {
+    response = await idem.save(db, {
         "booking": {
             "id": f"B-{new_booking.id_booking}",
-            "userId": str(user.id_customer),
+            "userId": str(user.id),
             "spotId": spot_id_str,
             "qr": qr,
             "status": new_booking.status,
@@ -193,28 +215,31 @@ def create_booking(
             "endTime": None,
             "cost": None
         }
-    }
+    })
+    await db.commit()
+    state_cache.set_slot(slot_id, booked=True)
+    booking_expiry.schedule(new_booking.id_booking, qr_expires_at)
+    
+    return response
 
 @router.get("/parking/active")
-def get_active_booking(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_active_booking(
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get active booking for current user"""
-    user = get_user_from_request(authorization, db)
-    
-    booking = db.query(models.Booking).filter(
-        models.Booking.id_customer == user.id_customer,
-        models.Booking.status.in_(["pending", "checked-in"])
-    ).first()
+    booking = (await db.scalars(
+        select(models.Booking).where(
+            models.Booking.id_customer == user.id,
+            models.Booking.status.in_(["pending", "checked-in"])
+        )
+    )).first()
     
     if not booking:
         return {"booking": None}
     
     # Get slot info - id_parkir directly references slot.id_slot
-    slot = db.query(models.Slot).filter(
-        models.Slot.id_slot == booking.id_parkir
-    ).first()
+    slot = await db.get(models.Slot, booking.id_parkir)
     
     if not slot:
         return {"booking": None}
@@ -232,9 +257,11 @@ def get_active_booking(
             
             if qr_expires_at_aware < now:
                 # Auto cancel expired booking
+                slot_id = slot.id_slot
                 booking.status = "cancelled"
                 slot.booked = False
-                db.commit()
+                await db.commit()
+                state_cache.set_slot(slot_id, booked=False)
                 return {"booking": None}
         
         # Use existing QR token or generate new if missing
@@ -246,9 +273,11 @@ def get_active_booking(
         else:
             # Generate new QR token if missing
             qr = create_qr_token()
+            qr_expires_at = get_now_gmt7() + timedelta(minutes=QR_TTL_MINUTES)
             booking.qr_token = qr["token"]
-            booking.qr_expires_at = get_now_gmt7() + timedelta(minutes=QR_TTL_MINUTES)
-            db.commit()
+            booking.qr_expires_at = qr_expires_at
+            await db.commit()
+            booking_expiry.schedule(booking.id_booking, qr_expires_at)
     else:
         # For checked-in, still return QR token if exists (for exit validation)
         if booking.qr_token and booking.qr_expires_at:
@@ -262,7 +291,7 @@ def get_active_booking(
     return {
         "booking": {
             "id": f"B-{booking.id_booking}",
-            "userId": str(user.id_customer),
+            "userId": str(user.id),
             "spotId": f"S{slot.id_slot}",
             "qr": qr,
             "status": booking.status,
@@ -274,59 +303,87 @@ def get_active_booking(
     }
 
 @router.post("/parking/cancel")
-def cancel_booking(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def cancel_booking(
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Cancel active booking"""
-    user = get_user_from_request(authorization, db)
-    
-    booking = db.query(models.Booking).filter(
-        models.Booking.id_customer == user.id_customer,
-        models.Booking.status == "pending"
-    ).first()
+    booking = (await db.scalars(
+        select(models.Booking).where(
+            models.Booking.id_customer == user.id,
+            models.Booking.status == "pending"
+        )
+    )).first()
     
     if not booking:
         raise HTTPException(status_code=400, detail="Tidak ada booking yang bisa dibatalkan")
     
     # Get slot and mark as available - id_parkir directly references slot.id_slot
-    slot = db.query(models.Slot).filter(
-        models.Slot.id_slot == booking.id_parkir
-    ).first()
+    slot = await db.get(models.Slot, booking.id_parkir)
     
     if slot:
         slot.booked = False
+        slot_id = slot.id_slot
     
     booking.status = "cancelled"
-    db.commit()
+    await db.commit()
+    if slot:
+        state_cache.set_slot(slot_id, booked=False)
     
     return {"message": "Booking berhasil dibatalkan"}
 
 @router.get("/parking/history")
-def get_history(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get parking history for current user - includes all statuses"""
-    user = get_user_from_request(authorization, db)
-    
-    # Get all bookings except active ones (pending and checked-in are shown in active booking)
+    """
+    Get parking history for current user - includes all statuses.
+    Keyset pagination: newest first, `nextCursor` dikirim ke `?cursor=` untuk halaman berikutnya.
+    """
     # Include: cancelled, completed, and also pending/checked-in for history
-    bookings = db.query(models.Booking).filter(
-        models.Booking.id_customer == user.id_customer
-    ).order_by(models.Booking.waktu_booking.desc()).all()
+    query = (
+        select(models.Booking)
+        .where(models.Booking.id_customer == user.id)
+        .options(joinedload(models.Booking.parkir))
+        .order_by(models.Booking.waktu_booking.desc(), models.Booking.id_booking.desc())
+        .limit(limit + 1)
+    )
+
+    after = decode_cursor(cursor, 2)
+    if after:
+        after_time, after_id = parse_datetime(after[0]), after[1]
+        # Urutan DESC menaruh waktu_booking NULL di akhir (MySQL & SQLite)
+        if after_time is not None:
+            query = query.where(or_(
+                models.Booking.waktu_booking < after_time,
+                and_(models.Booking.waktu_booking == after_time, models.Booking.id_booking < after_id),
+                models.Booking.waktu_booking.is_(None)
+            ))
+        else:
+            query = query.where(models.Booking.waktu_booking.is_(None), models.Booking.id_booking < after_id)
+
+    bookings = (await db.scalars(query)).all()
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        next_cursor = encode_cursor(bookings[-1].waktu_booking, bookings[-1].id_booking)
     
     history = []
     for booking in bookings:
-        # Get slot info - id_parkir directly references slot.id_slot
-        slot = db.query(models.Slot).filter(
-            models.Slot.id_slot == booking.id_parkir
-        ).first()
+        # Slot dimuat bersama booking (joinedload), tanpa query per baris
+        slot = booking.parkir
         
         # Calculate cost only for completed bookings
         cost = None
         duration_hours = None
-        if booking.status == "completed" and booking.waktu_masuk and booking.waktu_keluar:
+        if booking.status == "completed" and booking.biaya is not None:
+            # Biaya yang benar-benar ditagih saat keluar
+            cost = booking.biaya
+            duration_hours = booking.durasi_jam
+        elif booking.status == "completed" and booking.waktu_masuk and booking.waktu_keluar:
             cost_info = calculate_parking_cost(
                 booking.waktu_masuk,
                 booking.waktu_keluar
@@ -352,7 +409,7 @@ def get_history(
         
         history.append({
             "bookingId": f"B-{booking.id_booking}",
-            "userId": str(user.id_customer),
+            "userId": str(user.id),
             "spotName": f"Slot {slot.id_slot}" if slot else "Unknown",
             "startTime": booking.waktu_masuk.isoformat() if booking.waktu_masuk else (booking.waktu_booking.isoformat() if booking.waktu_booking else None),
             "endTime": booking.waktu_keluar.isoformat() if booking.waktu_keluar else None,
@@ -363,5 +420,5 @@ def get_history(
             "createdAt": booking.waktu_booking.isoformat() if booking.waktu_booking else None
         })
     
-    return {"history": history}
+    return {"history": history, "nextCursor": next_cursor}
 
@@ -1,78 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 import backend.models as models
-from backend.database import get_db
+import backend.wallet_ledger as wallet_ledger
+from backend.database import get_db, get_read_db
+from backend.idempotency import IdempotencyKey, idempotency_key
+from backend.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from backend.security import Principal, get_current_user
 
 router = APIRouter()
 
-def get_user_from_request(authorization: Optional[str] = None, db: Session = Depends(get_db)):
-    """Get user from authorization header"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    # Simple token extraction (in production, use proper JWT)
-    token = authorization.replace("Bearer ", "").strip()
-    try:
-        if token.startswith("token-"):
-            user_id = int(token.split("token-")[1])
-        else:
-            user_id = int(token) if token.isdigit() else None
-    except:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    user = db.query(models.Customer).filter(models.Customer.id_customer == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
-
 @router.get("/wallet")
-def get_wallet_balance(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+async def get_wallet_balance(
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get wallet balance for current user"""
-    user = get_user_from_request(authorization, db)
-    
     # Get customer with latest balance
-    customer = db.query(models.Customer).filter(
-        models.Customer.id_customer == user.id_customer
-    ).first()
+    customer = await db.get(models.Customer, user.id)
     
     balance = customer.saldo if customer else 0
     
     return {"balance": balance}
 
 @router.post("/wallet/topup")
-def topup_wallet(
+async def topup_wallet(
     topup_data: dict,
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db)
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    idem: IdempotencyKey = Depends(idempotency_key)
 ):
-    """Top up wallet balance"""
-    user = get_user_from_request(authorization, db)
-    
+    """Top up wallet balance (retry aman dengan header Idempotency-Key)"""
+    if idem.response is not None:
+        return idem.response
     amount = topup_data.get("amount")
     if not amount or amount <= 0:
         raise HTTPException(status_code=400, detail="Nominal tidak valid")
     
-    # Get customer
-    customer = db.query(models.Customer).filter(
-        models.Customer.id_customer == user.id_customer
-    ).first()
-    
-    if not customer:
+    # Update balance (atomik, dicatat di ledger)
+    balance = await wallet_ledger.apply(db, user.id, int(amount), wallet_ledger.TOPUP)
+    if balance is None:
         raise HTTPException(status_code=404, detail="Customer tidak ditemukan")
+    response = await idem.save(db, {"balance": balance})
+    await db.commit()
     
-    # Update balance
-    customer.saldo = (customer.saldo or 0) + int(amount)
-    db.commit()
-    db.refresh(customer)
-    
-    return {"balance": customer.saldo}
+    return response
+
+@router.get("/wallet/transactions")
+async def get_wallet_transactions(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Wallet statement for current user, newest first.
+    Tiap baris membawa snapshot saldo (`balanceAfter`), jadi satu halaman cukup
+    tanpa menjumlah seluruh ledger; `nextCursor` dikirim ke `?cursor=`.
+    """
+    query = (
+        select(models.WalletTransaction)
+        .where(models.WalletTransaction.id_customer == user.id)
+        .order_by(models.WalletTransaction.id_transaksi.desc())
+        .limit(limit + 1)
+    )
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.where(models.WalletTransaction.id_transaksi < after[0])
+
+    transactions = (await db.scalars(query)).all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = encode_cursor(transactions[-1].id_transaksi)
 
+    return {
+        "transactions": [
+            {
+                "transactionId": f"T-{trx.id_transaksi}",
+                "type": trx.jenis,
+                "amount": trx.jumlah,
+                "balanceAfter": trx.saldo_setelah,
+                "bookingId": f"B-{trx.id_booking}" if trx.id_booking else None,
+                "time": trx.waktu.isoformat() if trx.waktu else None,
+            }
+            for trx in transactions
+        ],
+        "nextCursor": next_cursor
+    }
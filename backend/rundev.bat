@@ -28,6 +28,9 @@ IF %ERRORLEVEL% NEQ 0 (
     exit /b 1
 )
 
+REM --- Secret token login khusus development (produksi wajib set AUTH_SECRET sendiri) ---
+IF "%AUTH_SECRET%"=="" set AUTH_SECRET=parkingly-dev-secret
+
 REM --- Move to backend folder ---
 cd backend
 
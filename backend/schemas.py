@@ -78,6 +78,17 @@ class SlotCreate(SlotBase):
     confirmed: bool = False
     occupied: bool = False
     alarmed: bool = False
+    bookable: Optional[bool] = None # None -> False untuk slot baru, tidak diubah saat PUT
+
+
+class SlotBulkItem(SlotBase):
+    # id_slot diisi -> upsert; kosong -> slot baru. Field yang tidak dikirim tidak diubah saat update
+    id_slot: Optional[int] = None
+    booked: bool = False
+    confirmed: bool = False
+    occupied: bool = False
+    alarmed: bool = False
+    bookable: bool = False
 
 
 class Slot(BaseModel):
@@ -86,6 +97,8 @@ class Slot(BaseModel):
     confirmed: bool = False # Slot sdh dikonfirmasi (true bila sudah scan)
     occupied: bool = False # Slot sedang ada mobilnya
     alarmed: bool = False # Slot yg belum confirm tapi sdh occupied (alarm bunyi)
+    bookable: bool = False # Boleh dibooking pengguna
+    state: int = 0 # Bitmask 4 flag di atas (lihat slot_status.py)
 
     class Config:
         from_attributes = True
@@ -103,6 +116,15 @@ class AktuatorCreate(AktuatorBase):
     pass
 
 
+class AktuatorBulkItem(AktuatorBase):
+    # id_aktuator diisi -> upsert; kosong -> aktuator baru
+    id_aktuator: Optional[int] = None
+    nama_aktuator: str = ""
+    usable: bool = True
+    kondisi_buka: bool = False
+    aksi_gate: str = "closed"
+
+
 class Aktuator(BaseModel):
     id_aktuator: int
     nama_aktuator: str
@@ -125,6 +147,20 @@ class MikrokontrolerBase(BaseModel):
 class MikrokontrolerCreate(MikrokontrolerBase):
     pass
 
+
+class MikrokontrolerBulkItem(MikrokontrolerBase):
+    id_mikrokontroler: Optional[int] = None
+
+
+# ======================================================
+# BULK PROVISIONING
+# ======================================================
+
+class BulkResult(BaseModel):
+    created: int
+    updated: int
+
+
 # ======================================================
 # BOOKING
 # ======================================================
@@ -142,6 +178,8 @@ class Booking(BookingBase):
     waktu_masuk: datetime.datetime | None
     waktu_keluar: datetime.datetime | None
     status: str
+    biaya: int | None = None
+    durasi_jam: int | None = None
 
 class BookingUpdate(BaseModel):
     id_parkir: int | None = None
@@ -162,6 +200,37 @@ class Mikrokontroler(BaseModel):
         from_attributes = True
 
 
+# ------ Per ?include= pada GET /mikrokontroler (hanya relasi yang dimuat) ------
+class MikrokontrolerRef(BaseModel):
+    id_mikrokontroler: int
+
+    class Config:
+        from_attributes = True
+
+
+class MikrokontrolerWithSlots(MikrokontrolerRef):
+    slot: List[Slot] = []
+
+
+class MikrokontrolerWithAktuator(MikrokontrolerRef):
+    aktuator: List[Aktuator] = []
+
+
+# ======================================================
+# ADMIN SCAN (OFFLINE BATCH)
+# ======================================================
+
+class ScanItem(BaseModel):
+    scanId: Optional[str] = None # Id unik dari scanner, untuk dedupe replay
+    qrToken: str
+    action: str # enter / exit
+    scannedAt: Optional[datetime.datetime] = None # Waktu scan di scanner (default: waktu server)
+
+
+class ScanBatch(BaseModel):
+    scans: List[ScanItem]
+
+
 # ======================================================
 # ESP32 HARDWARE DATA
 # ======================================================
@@ -180,7 +249,8 @@ class FromESP32_detection(BaseModel):
     slots: list[SlotDetection]
 
 class FromESP33_gate(BaseModel):
-    gates: list[GateCondition]
+    gates: list[GateCondition] = []
+    acks: list[int] = [] # seq gate_command yang sudah dieksekusi
 
 # API -> ESP32 -------------------------------
 class SlotData(BaseModel):
@@ -191,7 +261,14 @@ class SlotData(BaseModel):
 class GateData(BaseModel):
     id_aktuator: int
     buka: bool
+
+class GateCommandData(BaseModel):
+    seq: int # Nomor urut; dieksekusi sekali lalu di-ack lewat /hw/update-gate
+    id_aktuator: int
+    perintah: str
     
 class ToESP32(BaseModel):
     slots: list[SlotData]
     gates: list[GateData]
+    version: int = 0 # Versi state instruksi (untuk long-poll ?since=)
+    commands: list[GateCommandData] = [] # Semua perintah gate yang belum di-ack (urut seq)
@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+from backend.cache import TTLCache
+from backend.database import get_db
+
+# ================================
+# AUTH TOKEN (HMAC-SHA256)
+# ================================
+# Format token: <payload base64url>.<signature base64url>
+# payload = {"sub": <id>, "role": "user" | "admin", "exp": <unix time>}
+# Token diverifikasi tanpa query database.
+
+AUTH_SECRET = os.getenv("AUTH_SECRET")
+if not AUTH_SECRET:
+    # Secret acak per proses membuat token ditolak worker lain dan hilang saat restart
+    raise RuntimeError("AUTH_SECRET environment variable must be set")
+
+TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", 7 * 24 * 60 * 60))
+
+ROLE_USER = "user"
+ROLE_ADMIN = "admin"
+
+# Cache akun (principal) untuk handler yang butuh data akun
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+
+_principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def create_access_token(user_id: int, role: str) -> str:
+    """Create a signed access token with id, role and expiry claims"""
+    claims = {"sub": user_id, "role": role, "exp": int(time.time()) + TOKEN_TTL_SECONDS}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_access_token(token: str) -> Optional[Principal]:
+    """Verify signature and expiry; returns None for any invalid token"""
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+        if claims["exp"] < time.time():
+            return None
+        return Principal(id=int(claims["sub"]), role=claims["role"])
+    except Exception:
+        return None
+
+
+# ================================
+# FastAPI dependencies
+# ================================
+
+async def get_principal(authorization: Optional[str] = Header(None, alias="Authorization")) -> Principal:
+    """Get the principal from the Authorization header (no database access)"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    principal = decode_access_token(authorization.replace("Bearer ", "").strip())
+    if not principal:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return principal
+
+
+async def require_user(principal: Principal = Depends(get_principal)) -> Principal:
+    """Customer only"""
+    if principal.role != ROLE_USER:
+        raise HTTPException(status_code=403, detail="Khusus customer")
+    return principal
+
+
+async def require_admin(principal: Principal = Depends(get_principal)) -> Principal:
+    """Admin only"""
+    if principal.role != ROLE_ADMIN:
+        raise HTTPException(status_code=403, detail="Khusus admin")
+    return principal
+
+
+async def get_current_user(principal: Principal = Depends(require_user), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Customer whose account still exists (cached, at most one SELECT per TTL)"""
+    return await load_principal(db, principal)
+
+
+async def get_current_admin(principal: Principal = Depends(require_admin), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Admin whose account still exists (cached, at most one SELECT per TTL)"""
+    return await load_principal(db, principal)
+
+
+async def load_principal(db: AsyncSession, principal: Principal) -> Principal:
+    """Load account data for a verified principal through the TTL/LRU cache"""
+    key = (principal.role, principal.id)
+    cached = _principal_cache.get(key)
+    if cached:
+        return cached
+
+    if principal.role == ROLE_ADMIN:
+        account = await db.get(models.Admin, principal.id)
+    else:
+        account = await db.get(models.Customer, principal.id)
+    if not account:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    loaded = Principal(id=principal.id, role=principal.role, name=account.username, email=account.email)
+    _principal_cache.set(key, loaded)
+    return loaded
+
+
+def forget_principal(role: str, id_: int) -> None:
+    """Drop a cached account (call after updating or deleting it)"""
+    _principal_cache.pop((role, id_))
@@ -0,0 +1,62 @@
+# ================================
+# SLOT STATE BITMASK & STATUS TABLE
+# ================================
+# State slot = booked | confirmed << 1 | occupied << 2 | alarmed << 3 (0-15).
+# Kolom slot_condition.state (generated + index, migrasi 0006) menyimpan nilai
+# yang sama sehingga "hitung available" / "daftar alert" cukup lewat index.
+
+BOOKED = 1
+CONFIRMED = 2
+OCCUPIED = 4
+ALARMED = 8
+
+# Ekspresi SQL kolom generated (boolean = 0/1 di MySQL dan SQLite)
+STATE_SQL = "booked + 2 * confirmed + 4 * occupied + 8 * alarmed"
+
+STATUSES = ("available", "booked", "confirmed", "occupied", "alert", "unknown")
+
+
+def state_of(booked: bool, confirmed: bool, occupied: bool, alarmed: bool) -> int:
+    return (BOOKED if booked else 0) | (CONFIRMED if confirmed else 0) | \
+        (OCCUPIED if occupied else 0) | (ALARMED if alarmed else 0)
+
+
+def _derive(state: int) -> str:
+    booked = bool(state & BOOKED)
+    confirmed = bool(state & CONFIRMED)
+    occupied = bool(state & OCCUPIED)
+    alarmed = bool(state & ALARMED)
+
+    if not booked and not confirmed and not occupied and not alarmed:
+        return "available"
+    if booked and not confirmed and not occupied and not alarmed:
+        return "booked"
+    if booked and confirmed and not occupied and not alarmed:
+        return "confirmed"
+    if booked and confirmed and occupied and not alarmed:
+        return "occupied"
+    # Mobil terdeteksi tanpa konfirmasi scan (alarm bunyi), di-booking atau tidak
+    if not confirmed and occupied and alarmed:
+        return "alert"
+    return "unknown"
+
+
+# Dihitung sekali saat import: STATUS[state] -> status untuk frontend
+STATUS = tuple(_derive(state) for state in range(16))
+
+# Kebalikannya: status -> daftar nilai state (untuk WHERE state IN (...))
+STATES_BY_STATUS = {
+    status: tuple(state for state in range(16) if STATUS[state] == status)
+    for status in STATUSES
+}
+
+
+def count_by_status(states) -> dict:
+    """Count slots per status from their state bitmasks"""
+    counts = dict.fromkeys(STATUSES, 0)
+    total = 0
+    for state in states:
+        counts[STATUS[state]] += 1
+        total += 1
+    counts["total"] = total
+    return counts
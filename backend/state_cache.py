@@ -0,0 +1,279 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+import backend.slot_status as slot_status
+
+# ================================
+# SLOT & GATE STATE CACHE
+# ================================
+# Cache in-process untuk state slot (booked/confirmed/occupied/alarmed) dan
+# aktuator gate. Endpoint baca dilayani dari memori; endpoint tulis wajib
+# memanggil set_slot() / set_gate() / invalidate() SETELAH commit berhasil.
+# Setiap perubahan slot diteruskan ke subscriber (SSE /parking/spots/stream),
+# dan setiap perubahan instruksi ESP32 menaikkan `version` (long-poll
+# /hw/instruction).
+# Tidak ada invalidasi antar proses: backend wajib berjalan dengan satu
+# worker (dipaksa oleh database.acquire_instance_lock).
+
+# Event yang dikirim ke subscriber saat cache di-reset (perlu snapshot ulang)
+RESET = None
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Field yang dikirim ke ESP32 lewat /hw/instruction
+SLOT_INSTRUCTION_FIELDS = ("booked", "confirmed")
+GATE_INSTRUCTION_FIELDS = ("usable", "kondisi_buka")
+
+
+@dataclass(frozen=True)
+class SlotState:
+    id_slot: int
+    booked: bool = False
+    confirmed: bool = False
+    occupied: bool = False
+    alarmed: bool = False
+    bookable: bool = False
+    id_mikrokontroler: Optional[int] = None
+
+    @property
+    def state(self) -> int:
+        """Bitmask of the four flags (see slot_status)"""
+        return slot_status.state_of(self.booked, self.confirmed, self.occupied, self.alarmed)
+
+    @property
+    def status(self) -> str:
+        return slot_status.STATUS[self.state]
+
+
+@dataclass(frozen=True)
+class GateState:
+    id_aktuator: int
+    usable: bool = False
+    kondisi_buka: bool = False
+    aksi_gate: Optional[str] = None
+
+
+_lock = threading.Lock()
+_slots: Optional[dict[int, SlotState]] = None
+_gates: Optional[dict[int, GateState]] = None
+_generation = 0
+_subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+# Versi dimulai dari waktu (ms) supaya tetap naik setelah server restart
+_version = int(time.time() * 1000)
+_version_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+
+
+def _slot_from_row(slot: models.Slot) -> SlotState:
+    return SlotState(
+        id_slot=slot.id_slot,
+        booked=bool(slot.booked),
+        confirmed=bool(slot.confirmed),
+        occupied=bool(slot.occupied),
+        alarmed=bool(slot.alarmed),
+        bookable=bool(slot.bookable),
+        id_mikrokontroler=slot.id_mikrokontroler,
+    )
+
+
+def _gate_from_row(gate: models.Aktuator) -> GateState:
+    return GateState(
+        id_aktuator=gate.id_aktuator,
+        usable=bool(gate.usable),
+        kondisi_buka=bool(gate.kondisi_buka),
+        aksi_gate=gate.aksi_gate,
+    )
+
+
+async def get_slots(db: AsyncSession) -> list[SlotState]:
+    """Get all slot states, loading them with one query when the cache is cold"""
+    global _slots
+    with _lock:
+        if _slots is not None:
+            return sorted(_slots.values(), key=lambda s: s.id_slot)
+        generation = _generation
+
+    rows = (await db.scalars(select(models.Slot))).all()
+    loaded = {slot.id_slot: _slot_from_row(slot) for slot in rows}
+
+    with _lock:
+        # Jangan timpa cache bila ada invalidate() selama query berjalan
+        if _slots is None and generation == _generation:
+            _slots = loaded
+    return sorted(loaded.values(), key=lambda s: s.id_slot)
+
+
+async def get_gates(db: AsyncSession) -> list[GateState]:
+    """Get all actuator states, loading them with one query when the cache is cold"""
+    global _gates
+    with _lock:
+        if _gates is not None:
+            return sorted(_gates.values(), key=lambda g: g.id_aktuator)
+        generation = _generation
+
+    rows = (await db.scalars(select(models.Aktuator))).all()
+    loaded = {gate.id_aktuator: _gate_from_row(gate) for gate in rows}
+
+    with _lock:
+        if _gates is None and generation == _generation:
+            _gates = loaded
+    return sorted(loaded.values(), key=lambda g: g.id_aktuator)
+
+
+async def get_gate(db: AsyncSession, id_aktuator: int) -> Optional[GateState]:
+    """Get one actuator state (None if it does not exist)"""
+    with _lock:
+        if _gates is not None:
+            return _gates.get(id_aktuator)
+    for gate in await get_gates(db):
+        if gate.id_aktuator == id_aktuator:
+            return gate
+    return None
+
+
+def set_slot(id_slot: int, **fields) -> None:
+    """Apply committed field changes of one slot to the cache"""
+    with _lock:
+        if _slots is None:
+            # Cache kosong: mungkin sedang dimuat dengan snapshot sebelum commit ini,
+            # jadi batalkan muatan tersebut (generation naik)
+            _invalidate_locked()
+            return
+        current = _slots.get(id_slot)
+        if current is None:
+            # Slot belum dikenal cache (mis. baru dibuat) -> muat ulang nanti
+            _invalidate_locked()
+            return
+        updated = replace(current, **fields)
+        if updated == current:
+            return
+        _slots[id_slot] = updated
+        if any(getattr(updated, f) != getattr(current, f) for f in SLOT_INSTRUCTION_FIELDS):
+            _bump_version_locked()
+    _publish(updated)
+
+
+def set_gate(id_aktuator: int, **fields) -> None:
+    """Apply committed field changes of one actuator to the cache"""
+    with _lock:
+        if _gates is None:
+            _invalidate_locked()
+            return
+        current = _gates.get(id_aktuator)
+        if current is None:
+            _invalidate_locked()
+            return
+        updated = replace(current, **fields)
+        if updated == current:
+            return
+        _gates[id_aktuator] = updated
+        if any(getattr(updated, f) != getattr(current, f) for f in GATE_INSTRUCTION_FIELDS):
+            _bump_version_locked()
+
+
+def invalidate() -> None:
+    """Drop the cache; next read reloads it from the database"""
+    with _lock:
+        _invalidate_locked()
+
+
+def _invalidate_locked() -> None:
+    global _slots, _gates, _generation
+    _slots = None
+    _gates = None
+    _generation += 1
+    _bump_version_locked()
+    _publish(RESET)
+
+
+# ================================
+# INSTRUCTION VERSION (long-poll)
+# ================================
+
+def get_version() -> int:
+    with _lock:
+        return _version
+
+
+def bump_version() -> None:
+    """Wake long-poll /hw/instruction for changes outside the slot/gate cache (gate commands)"""
+    with _lock:
+        _bump_version_locked()
+
+
+async def wait_for_version(since: int, timeout: float) -> bool:
+    """Wait until the version differs from `since`; False when the timeout passes first"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    with _lock:
+        if _version != since:
+            return True
+        entry = (loop, future)
+        _version_waiters.add(entry)
+    try:
+        await asyncio.wait_for(future, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        with _lock:
+            _version_waiters.discard(entry)
+
+
+def _bump_version_locked() -> None:
+    global _version
+    _version += 1
+    for loop, future in list(_version_waiters):
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            _version_waiters.discard((loop, future))
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+# ================================
+# SUBSCRIBER (live stream)
+# ================================
+
+def subscribe() -> asyncio.Queue:
+    """Register a queue (on the running event loop) that receives slot changes"""
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _lock:
+        _subscribers.add((asyncio.get_running_loop(), queue))
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue) -> None:
+    with _lock:
+        for entry in [e for e in _subscribers if e[1] is queue]:
+            _subscribers.discard(entry)
+
+
+def _publish(event: Optional[SlotState]) -> None:
+    # Aman dipanggil dari thread mana pun (loop subscriber bisa berbeda)
+    for loop, queue in list(_subscribers):
+        try:
+            loop.call_soon_threadsafe(_offer, queue, event)
+        except RuntimeError:
+            # Event loop sudah ditutup
+            _subscribers.discard((loop, queue))
+
+
+def _offer(queue: asyncio.Queue, event: Optional[SlotState]) -> None:
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Subscriber terlalu lambat: buang antrian, minta snapshot ulang
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESET)
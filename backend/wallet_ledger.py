@@ -0,0 +1,75 @@
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.models as models
+
+# ================================
+# WALLET LEDGER
+# ================================
+# Saldo diubah dengan satu UPDATE atomik (saldo = saldo + delta, dengan syarat
+# hasilnya tidak negatif), lalu dicatat di wallet_transaction beserta snapshot
+# saldo_setelah. Top-up dan pembayaran bersamaan tidak saling menimpa dan
+# mutasi bisa dibaca per halaman tanpa menjumlah ulang seluruh ledger.
+
+TOPUP = "topup"
+CHARGE = "charge"
+OPENING = "opening"        # saldo awal (migrasi 0007 / customer baru lewat /db/customer)
+ADJUSTMENT = "adjustment"  # saldo diubah langsung lewat PUT /db/customer
+
+
+async def apply(
+    db: AsyncSession,
+    id_customer: int,
+    delta: int,
+    jenis: str,
+    id_booking: Optional[int] = None,
+) -> Optional[int]:
+    """Add `delta` to the balance inside the caller's transaction.
+
+    Returns the new balance, or None when the customer does not exist or the
+    balance would go below zero (nothing is written in that case).
+    """
+    saldo = func.coalesce(models.Customer.saldo, 0)
+    result = await db.execute(
+        update(models.Customer)
+        .where(models.Customer.id_customer == id_customer, saldo + delta >= 0)
+        .values(saldo=saldo + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return None
+
+    # Baris customer terkunci oleh UPDATE di atas sampai commit, jadi nilai ini
+    # adalah saldo tepat setelah transaksi ini
+    balance = await db.scalar(
+        select(models.Customer.saldo).where(models.Customer.id_customer == id_customer)
+    )
+    db.add(models.WalletTransaction(
+        id_customer=id_customer,
+        id_booking=id_booking,
+        jenis=jenis,
+        jumlah=delta,
+        saldo_setelah=balance,
+    ))
+    return balance
+
+
+async def set_balance(db: AsyncSession, id_customer: int, saldo: int, jenis: str = ADJUSTMENT) -> Optional[int]:
+    """Set the balance to `saldo` inside the caller's transaction, recording the difference.
+
+    Returns the new balance, or None when the customer does not exist or
+    `saldo` is negative.
+    """
+    # Kunci baris dulu supaya selisih tidak basi oleh top-up / pembayaran bersamaan
+    current = await db.scalar(
+        select(func.coalesce(models.Customer.saldo, 0))
+        .where(models.Customer.id_customer == id_customer)
+        .with_for_update()
+    )
+    if current is None or saldo < 0:
+        return None
+    if saldo == current:
+        return current
+    return await apply(db, id_customer, saldo - current, jenis)
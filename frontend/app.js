@@ -17,11 +17,9 @@ const PRICING = {
   extraHour: 5000,
 };
 
-// Hanya izinkan slot nomor 1 dan 2 untuk bisa dibooking
+// Slot yang boleh dibooking ditentukan backend (kolom slot_condition.bookable)
 function isBookableSpot(spot) {
-  if (!spot || !spot.code) return false;
-  const numeric = parseInt(String(spot.code).replace(/\D/g, ""), 10);
-  return numeric === 1 || numeric === 2;
+  return Boolean(spot && spot.bookable);
 }
 
 const state = {
@@ -33,8 +31,28 @@ const state = {
   durationInterval: null,
   selectedSpot: null,
   cachedSpots: [],
+  spotStream: null,
+  historyCursor: null,
+  idempotencyKeys: {},
 };
 
+// Idempotency-Key per aksi pengguna. Key disimpan sampai aksi berhasil, jadi
+// mengulang aksi yang sama setelah gagal/timeout memakai key yang sama dan
+// backend mengembalikan response pertama tanpa mendebit/mengkredit dua kali.
+function newIdempotencyKey() {
+  if (window.crypto && typeof window.crypto.randomUUID === "function") {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+function idempotencyKeyFor(keys, action) {
+  if (!keys[action]) {
+    keys[action] = newIdempotencyKey();
+  }
+  return keys[action];
+}
+
 const elements = {
   headerActions: document.getElementById("headerActions"),
   activeUser: document.getElementById("activeUser"),
@@ -70,6 +88,7 @@ const elements = {
   topupForm: document.getElementById("topupForm"),
   historyTable: document.getElementById("historyTable"),
   refreshHistory: document.getElementById("refreshHistory"),
+  loadMoreHistory: document.getElementById("loadMoreHistory"),
   refreshSpots: document.getElementById("refreshSpots"),
   adminRefreshSpots: document.getElementById("adminRefreshSpots"),
   adminScanForm: document.getElementById("adminScanForm"),
@@ -150,6 +169,14 @@ function switchAdminPanel(target) {
   elements.adminNavButtons.forEach((button) =>
     button.classList.toggle("active", button.dataset.view === target),
   );
+  if (target === "availability") {
+    loadAdminSpots();
+  }
+}
+
+function isAdminPanelVisible(target) {
+  const view = document.querySelector(`#adminView .view[data-panel="${target}"]`);
+  return Boolean(view && view.classList.contains("visible"));
 }
 
 function setAppState(role) {
@@ -172,6 +199,7 @@ function resetAppState() {
   elements.activeUser.textContent = "";
   clearCountdown();
   clearDurationTimer();
+  closeSpotStream();
   state.cachedSpots = [];
   setSelectedSpot(null);
   resetLiveMetrics();
@@ -211,7 +239,7 @@ function renderParkingGrid(list) {
       <div class="parking-slot-name">${spot.name}</div>
     `;
     
-    // Hanya slot 1 dan 2 yang bisa dipilih pengguna
+    // Hanya slot dengan bookable=true yang bisa dipilih pengguna
     if (isAvailableForUser) {
       slot.addEventListener("click", () => setSelectedSpot(spot));
     }
@@ -338,7 +366,7 @@ function renderSpots(list, targetList, includeMeta = true) {
     if (state.selectedSpot?.id === spot.id) {
       li.classList.add("selected");
     }
-    // Hanya slot 1 dan 2 yang bisa dipilih pengguna
+    // Hanya slot dengan bookable=true yang bisa dipilih pengguna
     if (isAvailableForUser) {
       li.addEventListener("click", () => setSelectedSpot(spot));
     }
@@ -360,10 +388,10 @@ function filterSpots(spots) {
 
 function setHeroSlots(spots) {
   if (!elements.heroSlots) return;
-  const list = Array.isArray(spots) ? spots : [];
-  // Hanya hitung slot yang benar-benar bisa dibooking (nomor 1 dan 2)
-  const available = list.filter((spot) => spot.isAvailable && isBookableSpot(spot)).length;
-  elements.heroSlots.textContent = available;
+  // Hanya slot yang bisa dibooking dan belum di-booking (dihitung dari daftar yang sudah ada)
+  elements.heroSlots.textContent = spots
+    ? spots.filter((spot) => isBookableSpot(spot) && spot.isAvailable).length
+    : "—";
 }
 
 function setSelectedSpot(spot) {
@@ -409,9 +437,11 @@ function setSelectedSpot(spot) {
   }
 }
 
-function renderHistory(rows) {
-  elements.historyTable.innerHTML = "";
-  if (!rows || !rows.length) {
+function renderHistory(rows, append = false) {
+  if (!append) {
+    elements.historyTable.innerHTML = "";
+  }
+  if (!append && (!rows || !rows.length)) {
     elements.historyTable.innerHTML =
       '<tr><td colspan="6" class="empty-state"><div class="empty-icon">📭</div><p class="empty-text">Belum ada riwayat parkir</p><p class="empty-subtext">Riwayat parkir Anda akan muncul di sini</p></td></tr>';
     return;
@@ -824,7 +854,14 @@ async function bootstrapSession(session) {
   elements.activeUser.textContent = `${session.user.name} (${session.role})`;
   try {
     if (session.role === "user") {
-      await Promise.all([loadSpots(), loadWallet(), loadHistory(), loadActiveBooking()]);
+      // Snapshot SSE sudah berisi daftar slot lengkap; /parking/spots hanya bila SSE tidak ada
+      const streaming = openSpotStream();
+      await Promise.all([
+        streaming ? null : loadSpots(),
+        loadWallet(),
+        loadHistory(),
+        loadActiveBooking(),
+      ]);
       // Show/hide booking button based on active booking after loading
       setTimeout(() => {
         if (state.activeBooking && (state.activeBooking.status === "pending" || state.activeBooking.status === "checked-in")) {
@@ -834,29 +871,34 @@ async function bootstrapSession(session) {
         }
       }, 100);
     } else {
-      await Promise.all([loadAdminSpots(), loadReports()]);
+      // Daftar slot admin dimuat saat panel "availability" dibuka
+      await loadReports();
     }
   } catch (err) {
     console.error(err);
   }
 }
 
+function applySpots(spots) {
+  state.cachedSpots = spots;
+  setHeroSlots(spots);
+  const filtered = filterSpots(spots);
+  renderSpots(filtered, elements.spotList);
+  const validSelection = state.selectedSpot
+    ? spots.find(
+        (spot) =>
+          spot.id === state.selectedSpot.id &&
+          spot.isAvailable &&
+          isBookableSpot(spot),
+      )
+    : null;
+  setSelectedSpot(validSelection || null);
+}
+
 async function loadSpots() {
   try {
     const { spots } = await apiFetch("/parking/spots");
-    state.cachedSpots = spots;
-    const filtered = filterSpots(spots);
-    renderSpots(filtered, elements.spotList);
-    const validSelection = state.selectedSpot
-      ? spots.find(
-          (spot) =>
-            spot.id === state.selectedSpot.id &&
-            spot.isAvailable &&
-            isBookableSpot(spot),
-        )
-      : null;
-    setSelectedSpot(validSelection || null);
-    setHeroSlots(spots);
+    applySpots(spots);
   } catch (err) {
     console.error("Load spots failed", err);
     if (elements.parkingGrid) {
@@ -864,8 +906,37 @@ async function loadSpots() {
     } else {
       renderSpots([], elements.spotList);
     }
-    setHeroSlots([]);
     setSelectedSpot(null);
+    setHeroSlots(null);
+  }
+}
+
+// Live update slot via Server-Sent Events: snapshot penuh lalu delta per slot.
+// Mengembalikan false bila browser tidak mendukung EventSource.
+function openSpotStream() {
+  if (!window.EventSource) return false;
+  if (state.spotStream) return true;
+  const stream = new EventSource(`${API_BASE_URL}/parking/spots/stream`);
+  stream.addEventListener("snapshot", (event) => {
+    const { spots } = JSON.parse(event.data);
+    applySpots(spots);
+  });
+  stream.addEventListener("spot", (event) => {
+    const spot = JSON.parse(event.data);
+    const known = state.cachedSpots.some((item) => item.id === spot.id);
+    const spots = known
+      ? state.cachedSpots.map((item) => (item.id === spot.id ? spot : item))
+      : [...state.cachedSpots, spot];
+    applySpots(spots);
+  });
+  state.spotStream = stream;
+  return true;
+}
+
+function closeSpotStream() {
+  if (state.spotStream) {
+    state.spotStream.close();
+    state.spotStream = null;
   }
 }
 
@@ -910,12 +981,36 @@ async function loadWallet() {
   }
 }
 
+const HISTORY_PAGE_SIZE = 20;
+
+function setHistoryCursor(cursor) {
+  state.historyCursor = cursor || null;
+  if (elements.loadMoreHistory) {
+    elements.loadMoreHistory.classList.toggle("hidden", !state.historyCursor);
+  }
+}
+
 async function loadHistory() {
   try {
-    const { history } = await apiFetch("/parking/history");
+    const { history, nextCursor } = await apiFetch(`/parking/history?limit=${HISTORY_PAGE_SIZE}`);
     renderHistory(history);
+    setHistoryCursor(nextCursor);
   } catch (err) {
     renderHistory([]);
+    setHistoryCursor(null);
+  }
+}
+
+async function loadMoreHistory() {
+  if (!state.historyCursor) return;
+  try {
+    const { history, nextCursor } = await apiFetch(
+      `/parking/history?limit=${HISTORY_PAGE_SIZE}&cursor=${encodeURIComponent(state.historyCursor)}`
+    );
+    renderHistory(history, true);
+    setHistoryCursor(nextCursor);
+  } catch (err) {
+    setHistoryCursor(null);
   }
 }
 
@@ -970,6 +1065,10 @@ elements.refreshHistory.addEventListener("click", () => {
   });
 });
 
+if (elements.loadMoreHistory) {
+  elements.loadMoreHistory.addEventListener("click", loadMoreHistory);
+}
+
 // Redirect to booking page instead of inline booking
 if (elements.goToBooking) {
   elements.goToBooking.addEventListener("click", () => {
@@ -978,7 +1077,7 @@ if (elements.goToBooking) {
       return;
     }
     if (!isBookableSpot(state.selectedSpot)) {
-      alert("Slot yang dipilih tidak tersedia untuk booking. Hanya slot 1 dan 2 yang dapat dibooking.");
+      alert("Slot yang dipilih tidak tersedia untuk booking.");
       return;
     }
     sessionStorage.setItem("selectedSpot", JSON.stringify(state.selectedSpot));
@@ -993,7 +1092,7 @@ if (elements.goToBookingSelected) {
       return;
     }
     if (!isBookableSpot(state.selectedSpot)) {
-      alert("Slot yang dipilih tidak tersedia untuk booking. Hanya slot 1 dan 2 yang dapat dibooking.");
+      alert("Slot yang dipilih tidak tersedia untuk booking.");
       return;
     }
     sessionStorage.setItem("selectedSpot", JSON.stringify(state.selectedSpot));
@@ -1029,11 +1128,14 @@ elements.topupForm.addEventListener("submit", async (event) => {
   event.preventDefault();
   const amount = Number(event.target.amount.value);
   if (!amount) return;
+  const action = `topup:${amount}`;
   try {
     const { balance } = await apiFetch("/wallet/topup", {
       method: "POST",
+      headers: { "Idempotency-Key": idempotencyKeyFor(state.idempotencyKeys, action) },
       body: { amount },
     });
+    delete state.idempotencyKeys[action];
     setWalletBalance(balance);
     event.target.reset();
   } catch (err) {
@@ -1171,7 +1273,11 @@ elements.adminScanForm.addEventListener("submit", async (event) => {
       <p class="result-subtext">Validasi berhasil</p>
     `;
     
-    await Promise.all([loadAdminSpots(), loadReports()]);
+    // Daftar slot hanya dimuat ulang bila panelnya sedang ditampilkan
+    await Promise.all([
+      isAdminPanelVisible("availability") ? loadAdminSpots() : null,
+      loadReports(),
+    ]);
     
     // Reset form
     event.target.reset();
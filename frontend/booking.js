@@ -12,11 +12,9 @@ const getApiBaseUrl = () => {
 const API_BASE_URL = getApiBaseUrl();
 const STORAGE_KEY = "ParkinglySession";
 
-// Hanya izinkan slot nomor 1 dan 2 untuk bisa dibooking
+// Slot yang boleh dibooking ditentukan backend (kolom slot_condition.bookable)
 function isBookableSpot(spot) {
-  if (!spot || !spot.code) return false;
-  const numeric = parseInt(String(spot.code).replace(/\D/g, ""), 10);
-  return numeric === 1 || numeric === 2;
+  return Boolean(spot && spot.bookable);
 }
 
 const bookingState = {
@@ -26,8 +24,26 @@ const bookingState = {
   activeBooking: null,
   countdownInterval: null,
   durationInterval: null,
+  idempotencyKeys: {},
 };
 
+// Idempotency-Key per aksi pengguna. Key disimpan sampai aksi berhasil, jadi
+// mengulang aksi yang sama setelah gagal/timeout memakai key yang sama dan
+// backend mengembalikan response pertama tanpa mendebit/mengkredit dua kali.
+function newIdempotencyKey() {
+  if (window.crypto && typeof window.crypto.randomUUID === "function") {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+function idempotencyKeyFor(keys, action) {
+  if (!keys[action]) {
+    keys[action] = newIdempotencyKey();
+  }
+  return keys[action];
+}
+
 const bookingElements = {
   headerActions: document.getElementById("headerActions"),
   activeUser: document.getElementById("activeUser"),
@@ -133,7 +149,7 @@ function loadSelectedSpot() {
       const spot = JSON.parse(selectedSpotData);
       // Cegah akses booking untuk slot selain nomor 1 dan 2
       if (!isBookableSpot(spot)) {
-        alert("Slot yang dipilih tidak tersedia untuk booking. Hanya slot 1 dan 2 yang dapat dibooking.");
+        alert("Slot yang dipilih tidak tersedia untuk booking.");
         sessionStorage.removeItem("selectedSpot");
         window.location.href = "index.html";
         return;
@@ -442,17 +458,20 @@ if (bookingElements.bookingForm) {
       return;
     }
     if (!isBookableSpot(bookingState.selectedSpot)) {
-      alert("Slot yang dipilih tidak tersedia untuk booking. Hanya slot 1 dan 2 yang dapat dibooking.");
+      alert("Slot yang dipilih tidak tersedia untuk booking.");
       return;
     }
     const payload = {
       spotId: bookingState.selectedSpot.id,
     };
+    const action = `book:${payload.spotId}`;
     try {
       const data = await apiFetch("/parking/book", {
         method: "POST",
+        headers: { "Idempotency-Key": idempotencyKeyFor(bookingState.idempotencyKeys, action) },
         body: payload,
       });
+      delete bookingState.idempotencyKeys[action];
       showActiveBooking(data.booking);
       sessionStorage.removeItem("selectedSpot");
       // Reload history to include new booking
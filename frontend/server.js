@@ -26,6 +26,7 @@ const spots = Array.from({ length: 8 }).map((_, idx) => ({
   code: `P-${idx + 1}`,
   level: 1,
   isAvailable: true,
+  bookable: idx < 2,
   ratePerHour: FIRST_HOUR_RATE,
 }));
 
@@ -14,6 +14,8 @@ const char* password = "donivalo99";
 // API Endpoints (HTTPS - Cloudflare)
 // =====================================================
 String GET_URL  = "https://api.parkingly.space/hw/instruction";
+// Long-poll: server menahan request sampai instruksi berubah (maks INSTRUCTION_WAIT detik)
+const int INSTRUCTION_WAIT = 2;
 String POST_URL = "https://api.parkingly.space/hw/update";
 String POST_GATE_URL = "https://api.parkingly.space/hw/update-gate";
 
@@ -71,6 +73,17 @@ bool alarmed[AMOUNT_OF_SLOTS]  = {false, false};
 unsigned long gateCloseTime[2] = {0, 0}; // Track when gate should be considered closed (index 0 = enter, 1 = exit)
 const unsigned long GATE_CLOSE_DELAY = 2500; // 2.5 seconds after opening (2s open + 0.5s buffer)
 bool gateNeedsUpdate[2] = {false, false}; // Track if gate status needs to be sent to backend (index 0 = enter, 1 = exit)
+bool gateOpening[2] = {false, false}; // Track if gate is currently opening (index 0 = enter, 1 = exit)
+long long instructionVersion = -1; // Versi instruksi terakhir dari backend (-1 = belum ada)
+bool lastBooked[AMOUNT_OF_SLOTS]    = {false, false}; // Instruksi slot terakhir (dipakai saat 304)
+bool lastConfirmed[AMOUNT_OF_SLOTS] = {false, false};
+const int MAX_EXECUTED_SEQS = 16;
+long long executedSeqs[MAX_EXECUTED_SEQS]; // Seq perintah gate yang sudah dieksekusi (ring buffer)
+int executedSeqCount = 0;
+int executedSeqNext = 0;
+const int MAX_PENDING_ACKS = 8;
+long long pendingAcks[MAX_PENDING_ACKS]; // Seq yang sudah dieksekusi tapi belum terkirim ke backend
+int pendingAckCount = 0;
 
 // =====================================================
 // Ultrasonic Measurement
@@ -114,18 +127,24 @@ bool isNeedToAlarm(int i, bool booked, bool confirmed) {
 // =====================================================
 // GET API (HTTPS)
 // =====================================================
-bool getFromAPI(JsonDocument &doc) {
+// Return: 1 = instruksi baru, 0 = tidak berubah (304), -1 = gagal
+int getFromAPI(JsonDocument &doc) {
   if (WiFi.status() != WL_CONNECTED) {
     Serial.println("[GET] WiFi not connected");
-    return false;
+    return -1;
   }
 
   WiFiClientSecure client;
   client.setInsecure();   // WAJIB untuk Cloudflare SSL
 
+  String url = GET_URL;
+  if (instructionVersion >= 0) {
+    url += "?since=" + String(instructionVersion) + "&wait=" + String(INSTRUCTION_WAIT);
+  }
+
   HTTPClient http;
-  http.setTimeout(5000);
-  http.begin(client, GET_URL);
+  http.setTimeout(5000 + INSTRUCTION_WAIT * 1000);
+  http.begin(client, url);
 
   Serial.println("[GET] Requesting instruction...");
   int code = http.GET();
@@ -133,10 +152,15 @@ bool getFromAPI(JsonDocument &doc) {
   Serial.print("[GET] HTTP Code: ");
   Serial.println(code);
 
+  if (code == HTTP_CODE_NOT_MODIFIED) {
+    http.end();
+    return 0;
+  }
+
   if (code != HTTP_CODE_OK) {
     Serial.println("[GET] Failed");
     http.end();
-    return false;
+    return -1;
   }
 
   String payload = http.getString();
@@ -144,8 +168,9 @@ bool getFromAPI(JsonDocument &doc) {
   Serial.println(payload);
 
   deserializeJson(doc, payload);
+  instructionVersion = doc["version"].as<long long>();
   http.end();
-  return true;
+  return 1;
 }
 
 // =====================================================
@@ -189,19 +214,31 @@ void sendToAPI() {
 }
 
 // =====================================================
-// POST API (HTTPS) - Gate Status Updates
+// POST API (HTTPS) - Gate Status Updates & Command Acks
 // =====================================================
-void sendGateStatusToAPI(int gateId, const char* condition) {
+// Kirim status "closed" untuk gate yang selesai beroperasi beserta ack seq
+// perintah yang sudah dieksekusi. Bila gagal, dicoba lagi di loop berikutnya.
+void sendGateStatusToAPI() {
   if (WiFi.status() != WL_CONNECTED) {
     Serial.println("[POST-GATE] WiFi not connected");
     return;
   }
 
-  StaticJsonDocument<256> doc;
+  StaticJsonDocument<512> doc;
   JsonArray gates = doc.createNestedArray("gates");
-  JsonObject gate = gates.createNestedObject();
-  gate["id_gate"] = gateId;
-  gate["condition"] = condition;
+  bool sentGate[2] = {false, false};
+  for (int i = 0; i < 2; i++) {
+    if (gateNeedsUpdate[i] && !gateOpening[i]) {
+      JsonObject gate = gates.createNestedObject();
+      gate["id_gate"] = i + 1; // index 0 = enter (1), 1 = exit (2)
+      gate["condition"] = "closed";
+      sentGate[i] = true;
+    }
+  }
+  JsonArray acks = doc.createNestedArray("acks");
+  for (int i = 0; i < pendingAckCount; i++) {
+    acks.add(pendingAcks[i]);
+  }
 
   String json;
   serializeJson(doc, json);
@@ -222,13 +259,49 @@ void sendGateStatusToAPI(int gateId, const char* condition) {
   Serial.println(code);
 
   http.end();
+
+  if (code == HTTP_CODE_OK) {
+    for (int i = 0; i < 2; i++) {
+      if (sentGate[i]) gateNeedsUpdate[i] = false;
+    }
+    pendingAckCount = 0;
+  }
+}
+
+void queueAck(long long seq) {
+  // Buffer penuh -> kirim dulu supaya tidak ada ack yang hilang
+  if (pendingAckCount >= MAX_PENDING_ACKS) {
+    sendGateStatusToAPI();
+    if (pendingAckCount >= MAX_PENDING_ACKS) return;
+  }
+  pendingAcks[pendingAckCount++] = seq;
+}
+
+bool isAckPending(long long seq) {
+  for (int i = 0; i < pendingAckCount; i++) {
+    if (pendingAcks[i] == seq) return true;
+  }
+  return false;
+}
+
+// Backend mengirim ulang perintah sampai di-ack, dan seq tidak selalu datang
+// berurutan (commit bisa selesai tidak urut), jadi dicek per seq, bukan seq tertinggi
+bool isExecuted(long long seq) {
+  for (int i = 0; i < executedSeqCount; i++) {
+    if (executedSeqs[i] == seq) return true;
+  }
+  return false;
+}
+
+void rememberExecuted(long long seq) {
+  executedSeqs[executedSeqNext] = seq;
+  executedSeqNext = (executedSeqNext + 1) % MAX_EXECUTED_SEQS;
+  if (executedSeqCount < MAX_EXECUTED_SEQS) executedSeqCount++;
 }
 
 // =====================================================
 // Gate Control
 // =====================================================
-bool gateOpening[2] = {false, false}; // Track if gate is currently opening (index 0 = enter, 1 = exit)
-
 void openGate(Servo &gate, int open, int close, int gateId) {
   Serial.println("[GATE] Open");
   gate.write(open);
@@ -298,8 +371,9 @@ void loop() {
   }
 
   // ===== GET instruction =====
-  StaticJsonDocument<512> apiResponse;
-  if (getFromAPI(apiResponse)) {
+  StaticJsonDocument<1024> apiResponse;
+  int result = getFromAPI(apiResponse);
+  if (result == 1) {
 
     JsonArray slots = apiResponse["slots"];
     JsonArray gates = apiResponse["gates"];
@@ -309,49 +383,59 @@ void loop() {
       int index = slot["id_slot"].as<int>() - 1;
       if (index < 0 || index >= AMOUNT_OF_SLOTS) continue;
 
-      bool booked    = slot["booked"];
-      bool confirmed = slot["confirmed"];
-
-      Serial.printf("[API] Slot %d | booked:%d confirmed:%d\n", index + 1, booked, confirmed);
+      lastBooked[index]    = slot["booked"];
+      lastConfirmed[index] = slot["confirmed"];
 
-      alarmed[index] = isNeedToAlarm(index, booked, confirmed);
-      if (alarmed[index]) alert(index);
+      Serial.printf("[API] Slot %d | booked:%d confirmed:%d\n", index + 1, lastBooked[index], lastConfirmed[index]);
     }
 
-    // Gate logic - only open if buka is true and gate is not already opening
     for (JsonObject gate : gates) {
-      int id   = gate["id_aktuator"];
-      bool buka = gate["buka"];
+      Serial.printf("[API] Gate %d | buka:%d\n", gate["id_aktuator"].as<int>(), gate["buka"].as<bool>());
+    }
+
+    // Gate logic - satu perintah = satu kali buka; tiap seq dieksekusi sekali lalu di-ack
+    JsonArray commands = apiResponse["commands"];
+    for (JsonObject command : commands) {
+      long long seq = command["seq"].as<long long>();
+      if (isExecuted(seq)) {
+        // Sudah dieksekusi tapi ack belum sampai ke backend: kirim ulang ack-nya
+        if (!isAckPending(seq)) queueAck(seq);
+        continue;
+      }
 
-      Serial.printf("[API] Gate %d | buka:%d\n", id, buka);
+      int id = command["id_aktuator"];
+      Serial.printf("[API] Command %lld | gate:%d %s\n", seq, id, command["perintah"].as<const char*>());
 
-      // Only open gate if buka is true and gate is not currently opening
-      // This prevents multiple simultaneous gate operations
-      if (id == 1 && buka && !gateOpening[0]) {
+      if (id == 1) {
         openGate(enterGate, ENTER_OPEN, ENTER_CLOSE, 1);
-      }
-      if (id == 2 && buka && !gateOpening[1]) {
+      } else if (id == 2) {
         openGate(exitGate, EXIT_OPEN, EXIT_CLOSE, 2);
       }
+      rememberExecuted(seq);
+      queueAck(seq);
     }
+  } else if (result == 0) {
+    Serial.println("[API] Instruction unchanged");
   } else {
     Serial.println("[API] is not okay");
   }
 
+  // Alarm logic - pakai instruksi terakhir (sensor tetap dibaca tiap loop)
+  for (int i = 0; i < AMOUNT_OF_SLOTS; i++) {
+    alarmed[i] = isNeedToAlarm(i, lastBooked[i], lastConfirmed[i]);
+    if (alarmed[i]) alert(i);
+  }
+
   // ===== POST status =====
   sendToAPI();
   
-  // Send gate status updates after gate operations complete
-  // This allows backend to reset kondisi_buka after hardware confirms gate closed
-  for (int i = 0; i < 2; i++) {
-    if (gateNeedsUpdate[i] && !gateOpening[i]) {
-      // Gate operation completed, send status update to backend
-      int gateId = i + 1; // Convert index to gate ID (1 = enter, 2 = exit)
-      sendGateStatusToAPI(gateId, "closed");
-      gateNeedsUpdate[i] = false; // Mark as sent
-    }
+  // Send gate status updates & command acks after gate operations complete
+  // This allows backend to reset kondisi_buka and dequeue the executed commands
+  if (pendingAckCount > 0 || gateNeedsUpdate[0] || gateNeedsUpdate[1]) {
+    sendGateStatusToAPI();
   }
 
   Serial.println("=================================");
-  delay(3000);
+  // Jeda singkat: penantian utama sudah terjadi di long-poll GET
+  delay(200);
 }
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import tempfile
+
+# Wajib di-set sebelum backend di-import (dibaca saat import)
+_DB_DIR = tempfile.mkdtemp(prefix="parkingly-test-")
+os.environ.setdefault("AUTH_SECRET", "test-secret")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_DIR}/boot.db"
+os.environ.pop("DATABASE_REPLICA_URL", None)
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import backend.booking_expiry as booking_expiry
+import backend.database as database
+import backend.gate_commands as gate_commands
+import backend.idempotency as idempotency
+import backend.models as models
+import backend.security as security
+import backend.state_cache as state_cache
+from backend.main import app
+
+# ================================
+# Fixture bersama: database SQLite baru per test
+# ================================
+# Backend dijalankan di atas aiosqlite (file sementara, migrasi Alembic
+# lengkap) tanpa lifespan; request lewat httpx.ASGITransport sehingga
+# request bersamaan benar-benar berjalan di event loop yang sama.
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _reset_process_state():
+    # Cache in-process dari test sebelumnya tidak boleh bocor
+    state_cache.invalidate()
+    idempotency._cache.clear()
+    security._principal_cache.clear()
+    database._recent_writers.clear()
+    with booking_expiry._lock:
+        booking_expiry._heap.clear()
+    with gate_commands._lock:
+        gate_commands._pending = None
+        gate_commands._loaded = False
+
+
+@pytest.fixture
+async def db_engine(tmp_path):
+    """Fresh migrated database bound to the backend's engine and session factories"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db", poolclass=NullPool)
+    database.engine = database.read_engine = engine
+    database.SessionLocal.configure(bind=engine)
+    database.ReadSessionLocal.configure(bind=engine)
+    _reset_process_state()
+    await database.run_migrations()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(db_engine):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+
+@pytest.fixture
+def statements(db_engine):
+    """SQL statements executed on the primary from now on"""
+    executed = []
+
+    @event.listens_for(db_engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    yield executed
+    event.remove(db_engine.sync_engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture
+def auth_headers():
+    """auth_headers(id, role="user") -> Authorization header with a signed token"""
+
+    def _headers(id_: int, role: str = security.ROLE_USER) -> dict:
+        return {"Authorization": "Bearer " + security.create_access_token(id_, role)}
+
+    return _headers
+
+
+@pytest.fixture
+def book(client, auth_headers):
+    """book(id_customer=1, spot="S1") -> QR token of a new pending booking"""
+
+    async def _book(id_customer: int = 1, spot: str = "S1") -> str:
+        response = await client.post("/parking/book", json={"spotId": spot}, headers=auth_headers(id_customer))
+        assert response.status_code == 200, response.text
+        return response.json()["booking"]["qr"]["token"]
+
+    return _book
+
+
+@pytest.fixture
+async def seed(db_engine):
+    """Microcontroller 1 with bookable slots 1-3, entry/exit gates 1-2, admin 1 and `customers` customers"""
+
+    async def _seed(customers: int = 1, saldo: int = 100000, slots: int = 3):
+        async with database.SessionLocal() as db:
+            db.add(models.Mikrokontroler(id_mikrokontroler=1))
+            for id_slot in range(1, slots + 1):
+                db.add(models.Slot(id_slot=id_slot, bookable=True, id_mikrokontroler=1))
+            for id_aktuator, nama in ((1, "enter"), (2, "exit")):
+                db.add(models.Aktuator(
+                    id_aktuator=id_aktuator, nama_aktuator=nama, usable=True,
+                    kondisi_buka=False, aksi_gate="closed", id_mikrokontroler=1
+                ))
+            for id_customer in range(1, customers + 1):
+                db.add(models.Customer(
+                    id_customer=id_customer, username=f"user{id_customer}", password="p",
+                    email=f"user{id_customer}@test", notelp=str(id_customer), saldo=saldo
+                ))
+            db.add(models.Admin(id_admin=1, username="admin", password="p", email="admin@test", notelp="0"))
+            await db.commit()
+
+    return _seed
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+import backend.booking_expiry as booking_expiry
+import backend.database as database
+import backend.models as models
+from backend.models import get_now_gmt7
+
+pytestmark = pytest.mark.anyio
+
+
+async def _expired_booking(client, auth_headers) -> int:
+    response = await client.post("/parking/book", json={"spotId": "S1"}, headers=auth_headers(1))
+    id_booking = int(response.json()["booking"]["id"].removeprefix("B-"))
+    expired_at = (get_now_gmt7() - timedelta(minutes=1)).replace(tzinfo=None)
+    async with database.SessionLocal() as db:
+        await db.execute(update(models.Booking).where(models.Booking.id_booking == id_booking)
+                         .values(qr_expires_at=expired_at))
+        await db.commit()
+    booking_expiry.schedule(id_booking, expired_at)
+    return id_booking
+
+
+async def test_failed_tick_is_retried_on_the_next_tick(client, seed, auth_headers):
+    await seed()
+    id_booking = await _expired_booking(client, auth_headers)
+
+    async def lost_connection():
+        raise OperationalError("COMMIT", {}, Exception("connection lost"))
+
+    async with database.SessionLocal() as db:
+        db.commit = lost_connection
+        with pytest.raises(OperationalError):
+            await booking_expiry.expire_due(db)
+
+    assert booking_expiry.has_due()
+    async with database.SessionLocal() as db:
+        assert await booking_expiry.expire_due(db) == 1
+
+    async with database.SessionLocal() as db:
+        assert (await db.get(models.Booking, id_booking)).status == "cancelled"
+        assert (await db.get(models.Slot, 1)).booked is False
+    spots = (await client.get("/parking/spots")).json()["spots"]
+    assert next(spot for spot in spots if spot["id"] == "S1")["isAvailable"] is True
@@ -0,0 +1,66 @@
+import asyncio
+import statistics
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+import backend.database as database
+import backend.models as models
+
+pytestmark = pytest.mark.anyio
+
+CUSTOMERS = 8
+
+
+async def test_concurrent_bookings_of_one_slot_have_exactly_one_winner(client, seed, auth_headers, record_property):
+    """Satu pemenang; bookings/sec dan latency p50 dicatat (jalankan dengan `-s` untuk melihat angkanya)"""
+    await seed(customers=CUSTOMERS)
+    latencies = []
+
+    async def book(id_customer: int):
+        started = time.perf_counter()
+        response = await client.post("/parking/book", json={"spotId": "S1"}, headers=auth_headers(id_customer))
+        latencies.append(time.perf_counter() - started)
+        return response
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(book(id_customer) for id_customer in range(1, CUSTOMERS + 1)))
+    elapsed = time.perf_counter() - started
+
+    bookings_per_second = CUSTOMERS / elapsed
+    p50_ms = statistics.median(latencies) * 1000
+    record_property("bookings_per_second", round(bookings_per_second, 1))
+    record_property("p50_latency_ms", round(p50_ms, 1))
+    print(f"\n/parking/book {CUSTOMERS} concurrent: {bookings_per_second:.1f} booking/s, p50 {p50_ms:.1f} ms")
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [400] * (CUSTOMERS - 1)
+    assert all(
+        response.json()["detail"] == "Lahan tidak tersedia"
+        for response in responses if response.status_code == 400
+    )
+
+    async with database.SessionLocal() as db:
+        bookings = await db.scalar(select(func.count()).select_from(models.Booking).where(models.Booking.id_parkir == 1))
+        slot = await db.get(models.Slot, 1)
+    assert bookings == 1
+    assert slot.booked
+
+    spots = (await client.get("/parking/spots")).json()["spots"]
+    assert next(spot for spot in spots if spot["id"] == "S1")["isAvailable"] is False
+
+
+async def test_losing_customer_can_book_another_slot(client, seed, auth_headers):
+    await seed(customers=2)
+
+    first, second = await asyncio.gather(
+        client.post("/parking/book", json={"spotId": "S1"}, headers=auth_headers(1)),
+        client.post("/parking/book", json={"spotId": "S1"}, headers=auth_headers(2)),
+    )
+    loser = 1 if first.status_code != 200 else 2
+    assert sorted([first.status_code, second.status_code]) == [200, 400]
+
+    retry = await client.post("/parking/book", json={"spotId": "S2"}, headers=auth_headers(loser))
+    assert retry.status_code == 200
+    assert retry.json()["booking"]["spotId"] == "S2"
@@ -0,0 +1,52 @@
+import pytest
+
+import backend.database as database
+import backend.gate_commands as gate_commands
+
+pytestmark = pytest.mark.anyio
+
+
+async def _enqueue(*gates: int):
+    async with database.SessionLocal() as db:
+        commands = [await gate_commands.enqueue(db, id_aktuator) for id_aktuator in gates]
+        await db.commit()
+    return commands
+
+
+async def test_command_committed_out_of_order_is_still_delivered(client, seed):
+    await seed()
+    first, second = await _enqueue(1, 2)
+    # Transaksi seq lebih kecil selesai belakangan
+    gate_commands.publish(second)
+    await client.get("/hw/instruction")
+    gate_commands.publish(first)
+
+    commands = (await client.get("/hw/instruction")).json()["commands"]
+
+    assert [command["seq"] for command in commands] == [first.id_command, second.id_command]
+
+
+async def test_commands_are_resent_until_acknowledged(client, seed):
+    await seed()
+    first, second = await _enqueue(1, 2)
+    gate_commands.publish(first)
+    gate_commands.publish(second)
+
+    acked = await client.post("/hw/update-gate", json={"acks": [first.id_command]})
+    assert acked.json()["acked"] == 1
+
+    commands = (await client.get("/hw/instruction")).json()["commands"]
+    assert [command["seq"] for command in commands] == [second.id_command]
+    assert gate_commands.stats()["acked"] == 1
+
+
+async def test_pending_command_skips_the_long_poll_wait(client, seed):
+    await seed()
+    version = (await client.get("/hw/instruction")).json()["version"]
+    (command,) = await _enqueue(1)
+    gate_commands.publish(command)
+
+    response = await client.get("/hw/instruction", params={"since": version + 10 ** 6, "wait": 5})
+
+    assert response.status_code == 200
+    assert [item["seq"] for item in response.json()["commands"]] == [command.id_command]
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+import backend.database as database
+import backend.models as models
+
+pytestmark = pytest.mark.anyio
+
+SLOT_COUNTS = (10, 100, 1000)
+BENCHMARK_FRAMES = 20
+
+
+def _frame(slots: int, occupied: bool) -> dict:
+    return {"slots": [
+        {"id_slot": id_slot, "occupied": occupied, "alarmed": False}
+        for id_slot in range(1, slots + 1)
+    ]}
+
+
+@pytest.mark.parametrize("slots", SLOT_COUNTS)
+async def test_changed_frame_is_one_bulk_update(client, seed, statements, slots):
+    await seed(slots=slots)
+    # Frame pertama memuat state cache (satu SELECT) tanpa perubahan
+    assert (await client.post("/hw/update", json=_frame(slots, False))).json()["changed"] == 0
+
+    statements.clear()
+    response = await client.post("/hw/update", json=_frame(slots, True))
+
+    assert response.json()["changed"] == slots
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE slot")
+
+    async with database.SessionLocal() as db:
+        occupied = await db.scalar(select(func.count()).select_from(models.Slot).where(models.Slot.occupied))
+    assert occupied == slots
+
+
+async def test_unchanged_frame_touches_no_database(client, seed, statements):
+    await seed(slots=100)
+    await client.post("/hw/update", json=_frame(100, True))
+
+    statements.clear()
+    response = await client.post("/hw/update", json=_frame(100, True))
+
+    assert response.json() == {"status": "OK", "saved_slot": 100, "changed": 0, "unchanged": 100}
+    assert statements == []
+
+
+@pytest.mark.parametrize("slots", SLOT_COUNTS)
+async def test_frames_per_second_benchmark(client, seed, record_property, slots):
+    """Frames/sec for frames that flip every slot (jalankan dengan `-s` untuk melihat angkanya)"""
+    await seed(slots=slots)
+    await client.post("/hw/update", json=_frame(slots, False))
+
+    started = time.perf_counter()
+    for frame in range(BENCHMARK_FRAMES):
+        response = await client.post("/hw/update", json=_frame(slots, frame % 2 == 0))
+        assert response.json()["changed"] == slots
+    elapsed = time.perf_counter() - started
+
+    frames_per_second = BENCHMARK_FRAMES / elapsed
+    record_property("frames_per_second", round(frames_per_second, 1))
+    print(f"\n/hw/update {slots} slot/frame: {frames_per_second:.1f} frame/s")
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import OperationalError
+
+import backend.database as database
+import backend.idempotency as idempotency
+import backend.models as models
+import backend.wallet_ledger as wallet_ledger
+
+pytestmark = pytest.mark.anyio
+
+
+def _key(value: str) -> dict:
+    return {"Idempotency-Key": value}
+
+
+async def _count(model, *where) -> int:
+    async with database.SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(model).where(*where))
+
+
+async def _saldo(id_customer: int) -> int:
+    async with database.SessionLocal() as db:
+        return (await db.get(models.Customer, id_customer)).saldo
+
+
+async def test_replayed_booking_returns_the_original_response(client, seed, auth_headers):
+    await seed()
+    headers = {**auth_headers(1), **_key("book-1")}
+
+    first = await client.post("/parking/book", json={"spotId": "S1"}, headers=headers)
+    replay = await client.post("/parking/book", json={"spotId": "S1"}, headers=headers)
+
+    assert first.status_code == replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert idempotency.REPLAYED_HEADER not in first.headers
+    assert await _count(models.Booking, models.Booking.id_customer == 1) == 1
+
+
+async def test_replayed_topup_credits_once(client, seed, auth_headers):
+    await seed(saldo=100000)
+    headers = {**auth_headers(1), **_key("topup-1")}
+
+    first = await client.post("/wallet/topup", json={"amount": 5000}, headers=headers)
+    replay = await client.post("/wallet/topup", json={"amount": 5000}, headers=headers)
+
+    assert first.json() == replay.json() == {"balance": 105000}
+    assert replay.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert await _saldo(1) == 105000
+    assert await _count(models.WalletTransaction, models.WalletTransaction.jenis == wallet_ledger.TOPUP) == 1
+
+
+async def test_duplicate_key_while_first_request_runs_gets_409(client, seed, auth_headers, monkeypatch):
+    await seed(saldo=100000)
+    headers = {**auth_headers(1), **_key("topup-slow")}
+    entered, release = asyncio.Event(), asyncio.Event()
+    apply = wallet_ledger.apply
+
+    async def paused_apply(*args, **kwargs):
+        entered.set()
+        await release.wait()
+        return await apply(*args, **kwargs)
+
+    monkeypatch.setattr(wallet_ledger, "apply", paused_apply)
+
+    first = asyncio.create_task(client.post("/wallet/topup", json={"amount": 5000}, headers=headers))
+    await entered.wait()
+    duplicate = await client.post("/wallet/topup", json={"amount": 5000}, headers=headers)
+    release.set()
+
+    assert duplicate.status_code == 409
+    assert (await first).json() == {"balance": 105000}
+    assert idempotency._in_flight == set()
+    assert await _saldo(1) == 105000
+
+
+async def test_rolled_back_transaction_caches_no_key_and_retry_proceeds(client, seed, auth_headers):
+    await seed(saldo=100000)
+    headers = {**auth_headers(1), **_key("topup-lost")}
+
+    def fail_commit(session):
+        raise OperationalError("COMMIT", {}, Exception("connection lost"))
+
+    event.listen(database.PrimarySession, "before_commit", fail_commit)
+    try:
+        with pytest.raises(OperationalError):
+            await client.post("/wallet/topup", json={"amount": 5000}, headers=headers)
+    finally:
+        event.remove(database.PrimarySession, "before_commit", fail_commit)
+
+    assert len(idempotency._cache) == 0
+    assert idempotency._in_flight == set()
+    assert await _count(models.IdempotencyKey) == 0
+    assert await _saldo(1) == 100000
+
+    retry = await client.post("/wallet/topup", json={"amount": 5000}, headers=headers)
+    assert retry.status_code == 200
+    assert idempotency.REPLAYED_HEADER not in retry.headers
+    assert retry.json() == {"balance": 105000}
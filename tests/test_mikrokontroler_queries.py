@@ -0,0 +1,68 @@
+import pytest
+
+import backend.database as database
+import backend.models as models
+
+pytestmark = pytest.mark.anyio
+
+
+async def _fleet(controllers: int):
+    """`controllers` microcontrollers, each with two slots and one actuator"""
+    async with database.SessionLocal() as db:
+        for id_mikrokontroler in range(1, controllers + 1):
+            db.add(models.Mikrokontroler(id_mikrokontroler=id_mikrokontroler))
+            for offset in (0, 1):
+                db.add(models.Slot(id_slot=id_mikrokontroler * 2 - 1 + offset, id_mikrokontroler=id_mikrokontroler))
+            db.add(models.Aktuator(
+                id_aktuator=id_mikrokontroler, nama_aktuator=f"gate{id_mikrokontroler}", usable=True,
+                kondisi_buka=False, aksi_gate="closed", id_mikrokontroler=id_mikrokontroler
+            ))
+        await db.commit()
+
+
+@pytest.mark.parametrize("controllers", [1, 10, 50])
+@pytest.mark.parametrize("include, queries", [
+    ("slots,actuators", 3),
+    ("slots", 2),
+    ("actuators", 2),
+    ("", 1),
+])
+async def test_query_count_does_not_grow_with_fleet(client, statements, controllers, include, queries):
+    await _fleet(controllers)
+    statements.clear()
+
+    response = await client.get("/db/mikrokontroler", params={"include": include})
+
+    assert response.status_code == 200
+    assert len(statements) == queries
+    body = response.json()
+    assert len(body) == controllers
+    if "slots" in include:
+        assert all(len(item["slot"]) == 2 for item in body)
+    if "actuators" in include:
+        assert all(len(item["aktuator"]) == 1 for item in body)
+
+
+async def test_default_includes_both_relations(client, statements):
+    await _fleet(5)
+    statements.clear()
+
+    body = (await client.get("/db/mikrokontroler")).json()
+
+    assert len(statements) == 3
+    assert {len(item["slot"]) for item in body} == {2}
+    assert {len(item["aktuator"]) for item in body} == {1}
+
+
+@pytest.mark.parametrize("include, keys", [
+    ("slots,actuators", {"id_mikrokontroler", "slot", "aktuator"}),
+    ("slots", {"id_mikrokontroler", "slot"}),
+    ("actuators", {"id_mikrokontroler", "aktuator"}),
+    ("", {"id_mikrokontroler"}),
+])
+async def test_response_only_contains_included_relations(client, include, keys):
+    await _fleet(2)
+
+    body = (await client.get("/db/mikrokontroler", params={"include": include})).json()
+
+    assert all(set(item) == keys for item in body)
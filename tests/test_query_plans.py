@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import event, inspect
+
+pytestmark = pytest.mark.anyio
+
+# ================================
+# EXPLAIN QUERY PLAN untuk query hot path
+# ================================
+# Statement yang benar-benar dijalankan endpoint direkam (beserta parameternya),
+# lalu di-EXPLAIN di SQLite: tabel besar harus dibaca lewat index, bukan SCAN.
+
+
+@pytest.fixture
+def captured(db_engine):
+    executed = []
+
+    @event.listens_for(db_engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            executed.append((statement, parameters))
+
+    yield executed
+    event.remove(db_engine.sync_engine, "before_cursor_execute", _record)
+
+
+async def _plans(db_engine, captured, table: str) -> list[str]:
+    """Query plan (one string per statement) of every captured SELECT reading `table`"""
+    plans = []
+    async with db_engine.connect() as connection:
+        for statement, parameters in captured:
+            if f"FROM {table}" not in statement and f"JOIN {table}" not in statement:
+                continue
+            rows = await connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append(" | ".join(row[-1] for row in rows))
+    captured.clear()
+    assert plans, f"no SELECT on {table} was captured"
+    return plans
+
+
+def _assert_uses_index(plans: list[str], table: str, index: str):
+    assert any(f"{table} USING INDEX {index}" in plan or f"{table} USING COVERING INDEX {index}" in plan
+               for plan in plans), plans
+    # SCAN = seluruh tabel / index dibaca; hot path harus SEARCH
+    assert not any(f"SCAN {table}" in plan for plan in plans), plans
+
+
+async def test_booking_and_active_booking_use_customer_status_index(client, seed, auth_headers, book, db_engine, captured):
+    await seed()
+    await book()
+    _assert_uses_index(await _plans(db_engine, captured, "booking"), "booking", "ix_booking_customer_status")
+
+    assert (await client.get("/parking/active", headers=auth_headers(1))).status_code == 200
+    _assert_uses_index(await _plans(db_engine, captured, "booking"), "booking", "ix_booking_customer_status")
+
+
+async def test_admin_scan_uses_qr_token_index(client, seed, auth_headers, book, db_engine, captured):
+    await seed()
+    token = await book()
+    captured.clear()
+
+    response = await client.post("/admin/scan", json={"qrToken": token, "action": "enter"}, headers=auth_headers(1, "admin"))
+    assert response.status_code == 200
+    _assert_uses_index(await _plans(db_engine, captured, "booking"), "booking", "ix_booking_qr_token")
+
+
+async def test_history_uses_customer_history_index(client, seed, auth_headers, book, db_engine, captured):
+    await seed()
+    await book()
+    captured.clear()
+
+    assert (await client.get("/parking/history", headers=auth_headers(1))).status_code == 200
+    _assert_uses_index(await _plans(db_engine, captured, "booking"), "booking", "ix_booking_customer_history")
+
+
+async def test_wallet_transactions_use_customer_index(client, seed, auth_headers, db_engine, captured):
+    await seed()
+    await client.post("/wallet/topup", json={"amount": 1000}, headers=auth_headers(1))
+    captured.clear()
+
+    assert (await client.get("/wallet/transactions", headers=auth_headers(1))).status_code == 200
+    _assert_uses_index(
+        await _plans(db_engine, captured, "wallet_transaction"),
+        "wallet_transaction", "ix_wallet_transaction_customer"
+    )
+
+
+async def test_reports_read_rollup_not_booking(client, seed, auth_headers, db_engine, captured):
+    await seed()
+    captured.clear()
+
+    assert (await client.get("/admin/reports", headers=auth_headers(1, "admin"))).status_code == 200
+    assert not any("FROM booking" in statement for statement, _ in captured)
+    assert any("FROM daily_revenue" in statement for statement, _ in captured)
+
+    # Karena itu index (status, waktu_keluar) dari 0002 dihapus di 0011
+    async with db_engine.connect() as connection:
+        indexes = await connection.run_sync(lambda sync: inspect(sync).get_indexes("booking"))
+    assert "ix_booking_status_waktu_keluar" not in {index["name"] for index in indexes}
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import backend.database as database
+import backend.models as models
+from backend.cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+# Saldo di replica sengaja berbeda dari primary (replica "tertinggal")
+PRIMARY_SALDO = 100000
+REPLICA_SALDO = 1
+
+
+@pytest.fixture
+async def replica(db_engine, tmp_path):
+    """Second SQLite database standing in for the read replica"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db", poolclass=NullPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(database.Base.metadata.create_all)
+    database.read_engine = engine
+    database.ReadSessionLocal.configure(bind=engine)
+    yield engine
+    await engine.dispose()
+
+
+async def _seed_replica(customers: int = 2):
+    async with database.ReadSessionLocal() as db:
+        for id_customer in range(1, customers + 1):
+            db.add(models.Customer(
+                id_customer=id_customer, username=f"user{id_customer}", password="p",
+                email=f"user{id_customer}@test", notelp=str(id_customer), saldo=REPLICA_SALDO
+            ))
+        await db.commit()
+
+
+async def _balance(client, headers) -> int:
+    response = await client.get("/wallet", headers=headers)
+    assert response.status_code == 200
+    return response.json()["balance"]
+
+
+async def test_reads_go_to_the_replica_without_a_recent_write(client, seed, replica, auth_headers):
+    await seed(customers=2, saldo=PRIMARY_SALDO)
+    await _seed_replica()
+
+    assert await _balance(client, auth_headers(1)) == REPLICA_SALDO
+
+
+async def test_client_reads_its_own_write_from_the_primary(client, seed, replica, auth_headers):
+    await seed(customers=2, saldo=PRIMARY_SALDO)
+    await _seed_replica()
+    writer = auth_headers(1)
+
+    topup = await client.post("/wallet/topup", json={"amount": 500}, headers=writer)
+    assert topup.status_code == 200
+
+    assert await _balance(client, writer) == PRIMARY_SALDO + 500
+    # Client lain tetap dilayani replica
+    assert await _balance(client, auth_headers(2)) == REPLICA_SALDO
+
+
+async def test_failed_write_does_not_pin_reads_to_the_primary(client, seed, replica, auth_headers):
+    await seed(customers=2, saldo=PRIMARY_SALDO)
+    await _seed_replica()
+    headers = auth_headers(1)
+
+    topup = await client.post("/wallet/topup", json={"amount": -5}, headers=headers)
+    assert topup.status_code == 400
+
+    assert await _balance(client, headers) == REPLICA_SALDO
+
+
+async def test_reads_return_to_the_replica_after_the_window(client, seed, replica, auth_headers, monkeypatch):
+    monkeypatch.setattr(database, "_recent_writers", TTLCache(maxsize=100, ttl=0.05))
+    await seed(customers=2, saldo=PRIMARY_SALDO)
+    await _seed_replica()
+    headers = auth_headers(1)
+
+    await client.post("/wallet/topup", json={"amount": 500}, headers=headers)
+    assert await _balance(client, headers) == PRIMARY_SALDO + 500
+
+    await asyncio.sleep(0.1)
+    assert await _balance(client, headers) == REPLICA_SALDO
+
+
+async def test_unauthenticated_listing_reads_own_write_by_client_address(client, seed, replica):
+    await seed(customers=1, saldo=PRIMARY_SALDO)
+    await _seed_replica(customers=1)
+
+    assert len((await client.get("/db/customer")).json()) == 1
+
+    created = await client.post("/db/customer", json={
+        "username": "baru", "password": "p", "email": "baru@test", "notelp": "9"
+    })
+    assert created.status_code == 200
+
+    assert len((await client.get("/db/customer")).json()) == 2
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import backend.database as database
+import backend.idempotency as idempotency
+import backend.models as models
+from backend.security import Principal, ROLE_ADMIN
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_aware_scanned_at_is_stored_in_gmt7(client, seed, auth_headers, book):
+    await seed()
+    token = await book()
+    scanned_at = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=5)
+
+    response = await client.post("/admin/scan/batch", json={"scans": [
+        {"scanId": "a", "qrToken": token, "action": "enter", "scannedAt": scanned_at.isoformat()}
+    ]}, headers=auth_headers(1, ROLE_ADMIN))
+    assert response.json()["applied"] == 1
+
+    async with database.SessionLocal() as db:
+        booking = await db.get(models.Booking, 1)
+    expected = scanned_at.astimezone(timezone(timedelta(hours=7))).replace(tzinfo=None)
+    assert booking.waktu_masuk.replace(tzinfo=None) == expected
+
+
+async def test_failed_item_keeps_earlier_idempotency_keys(client, seed, auth_headers, book):
+    await seed()
+    token = await book()
+
+    response = await client.post("/admin/scan/batch", json={"scans": [
+        {"scanId": "ok", "qrToken": token, "action": "enter"},
+        {"scanId": "gagal", "qrToken": "tidak-ada", "action": "enter"},
+    ]}, headers=auth_headers(1, ROLE_ADMIN))
+    assert (response.json()["applied"], response.json()["failed"]) == (1, 1)
+
+    kunci = idempotency.make_key(Principal(1, ROLE_ADMIN), "/admin/scan", "ok")
+    assert idempotency._cache.get(kunci) is not None
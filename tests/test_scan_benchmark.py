@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+import backend.database as database
+import backend.models as models
+
+pytestmark = pytest.mark.anyio
+
+# Target latensi /admin/scan (in-process, SQLite); mobil menunggu di palang selama ini
+SCAN_P50_TARGET_MS = 50
+SCAN_P99_TARGET_MS = 250
+BENCHMARK_CYCLES = 50
+
+
+async def _scan(client, auth_headers, token: str, action: str):
+    return await client.post(
+        "/admin/scan", json={"qrToken": token, "action": action}, headers=auth_headers(1, "admin")
+    )
+
+
+async def test_scan_reads_booking_slot_and_customer_in_one_select(client, seed, auth_headers, book, statements):
+    await seed()
+    token = await book()
+    # Pemanasan: principal admin dan state gate masuk cache
+    assert (await _scan(client, auth_headers, "tidak-ada", "enter")).status_code == 404
+    await client.get("/hw/instruction")
+
+    for action in ("enter", "exit"):
+        statements.clear()
+        response = await _scan(client, auth_headers, token, action)
+        assert response.status_code == 200
+
+        selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+        booking_reads = [statement for statement in selects if "FROM booking" in statement]
+        assert len(booking_reads) == 1
+        assert "JOIN slot_condition" in booking_reads[0] and "JOIN customer" in booking_reads[0]
+        assert not any("FROM aktuator" in statement for statement in selects)
+
+
+async def test_scan_latency_benchmark(client, seed, auth_headers, book, record_property):
+    await seed(saldo=10 ** 9)
+    await _scan(client, auth_headers, "tidak-ada", "enter")
+
+    latencies = []
+    for _ in range(BENCHMARK_CYCLES):
+        token = await book()
+        for action in ("enter", "exit"):
+            started = time.perf_counter()
+            response = await _scan(client, auth_headers, token, action)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    record_property("scan_p50_ms", round(p50, 2))
+    record_property("scan_p99_ms", round(p99, 2))
+    print(f"\n/admin/scan p50 {p50:.2f} ms, p99 {p99:.2f} ms ({len(latencies)} scan)")
+
+    assert p50 < SCAN_P50_TARGET_MS
+    assert p99 < SCAN_P99_TARGET_MS
+
+    async with database.SessionLocal() as db:
+        assert (await db.get(models.Slot, 1)).booked is False
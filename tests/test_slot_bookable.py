@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import update
+
+import backend.database as database
+import backend.models as models
+import backend.state_cache as state_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def _make_unbookable(id_slot: int):
+    async with database.SessionLocal() as db:
+        await db.execute(update(models.Slot).where(models.Slot.id_slot == id_slot).values(bookable=False))
+        await db.commit()
+    state_cache.invalidate()
+
+
+async def test_spot_payload_and_summary_follow_bookable_column(client, seed, auth_headers):
+    await seed()
+    await _make_unbookable(3)
+
+    spots = (await client.get("/parking/spots")).json()["spots"]
+    assert {spot["id"]: spot["bookable"] for spot in spots} == {"S1": True, "S2": True, "S3": False}
+
+    summary = (await client.get("/parking/summary")).json()["summary"]
+    assert summary["bookableAvailable"] == 2
+
+    booked = await client.post("/parking/book", json={"spotId": "S1"}, headers=auth_headers(1))
+    assert booked.status_code == 200
+    summary = (await client.get("/parking/summary")).json()["summary"]
+    assert summary["bookableAvailable"] == 1
+
+
+async def test_booking_a_non_bookable_slot_is_rejected(client, seed, auth_headers):
+    await seed()
+    await _make_unbookable(3)
+
+    response = await client.post("/parking/book", json={"spotId": "S3"}, headers=auth_headers(1))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Slot ini tidak dapat dibooking"
+
+    async with database.SessionLocal() as db:
+        slot = await db.get(models.Slot, 3)
+    assert not slot.booked
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+
+import backend.database as database
+import backend.models as models
+import backend.state_cache as state_cache
+
+pytestmark = pytest.mark.anyio
+
+
+class _PausedSession:
+    """Session whose next query result is held back until `release` is set"""
+
+    def __init__(self, db):
+        self._db = db
+        self.loaded = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def scalars(self, *args, **kwargs):
+        result = await self._db.scalars(*args, **kwargs)
+        self.loaded.set()
+        await self.release.wait()
+        return result
+
+
+async def _write_during_cold_load(load, write):
+    state_cache.invalidate()
+    async with database.SessionLocal() as db:
+        paused = _PausedSession(db)
+        loading = asyncio.create_task(load(paused))
+        await paused.loaded.wait()
+
+        # Snapshot lama sudah dibaca; commit + update cache terjadi sebelum loader selesai
+        await write()
+
+        paused.release.set()
+        await loading
+
+
+async def test_slot_write_during_cold_load_is_not_lost(seed):
+    await seed()
+
+    async def write():
+        async with database.SessionLocal() as db:
+            await db.execute(update(models.Slot).where(models.Slot.id_slot == 1).values(booked=True))
+            await db.commit()
+        state_cache.set_slot(1, booked=True)
+
+    await _write_during_cold_load(state_cache.get_slots, write)
+
+    async with database.SessionLocal() as db:
+        slots = {slot.id_slot: slot for slot in await state_cache.get_slots(db)}
+    assert slots[1].booked is True
+
+
+async def test_gate_write_during_cold_load_is_not_lost(seed):
+    await seed()
+
+    async def write():
+        async with database.SessionLocal() as db:
+            await db.execute(update(models.Aktuator).where(models.Aktuator.id_aktuator == 1).values(kondisi_buka=True))
+            await db.commit()
+        state_cache.set_gate(1, kondisi_buka=True)
+
+    await _write_during_cold_load(state_cache.get_gates, write)
+
+    async with database.SessionLocal() as db:
+        gate = await state_cache.get_gate(db, 1)
+    assert gate.kondisi_buka is True
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+import backend.database as database
+import backend.models as models
+import backend.wallet_ledger as wallet_ledger
+
+pytestmark = pytest.mark.anyio
+
+
+async def _charge(amount: int):
+    async with database.SessionLocal() as db:
+        balance = await wallet_ledger.apply(db, 1, -amount, wallet_ledger.CHARGE)
+        await db.commit()
+        return balance
+
+
+async def _ledger(id_customer: int = 1) -> list[models.WalletTransaction]:
+    async with database.SessionLocal() as db:
+        return (await db.scalars(
+            select(models.WalletTransaction)
+            .where(models.WalletTransaction.id_customer == id_customer)
+            .order_by(models.WalletTransaction.id_transaksi)
+        )).all()
+
+
+async def _saldo(id_customer: int = 1) -> int:
+    async with database.SessionLocal() as db:
+        return (await db.get(models.Customer, id_customer)).saldo
+
+
+async def test_concurrent_topups_and_charges_give_exact_balance(client, seed, auth_headers):
+    await seed(saldo=1000)
+    topups = [
+        client.post("/wallet/topup", json={"amount": 100}, headers=auth_headers(1))
+        for _ in range(50)
+    ]
+    charges = [_charge(30) for _ in range(50)]
+
+    results = await asyncio.gather(*topups, *charges)
+
+    assert all(response.status_code == 200 for response in results[:50])
+    assert all(balance is not None for balance in results[50:])
+    assert await _saldo() == 1000 + 50 * 100 - 50 * 30
+
+    # Setiap snapshot saldo_setelah = snapshot sebelumnya + jumlah (tidak ada update yang hilang)
+    ledger = await _ledger()
+    assert len(ledger) == 100
+    balance = 1000
+    for trx in ledger:
+        balance += trx.jumlah
+        assert trx.saldo_setelah == balance
+    assert balance == 4500
+
+
+async def test_concurrent_charges_never_overdraw(client, seed):
+    await seed(saldo=100)
+
+    balances = await asyncio.gather(*(_charge(30) for _ in range(10)))
+
+    assert sum(balance is not None for balance in balances) == 3
+    assert await _saldo() == 10
+    assert [trx.jumlah for trx in await _ledger()] == [-30, -30, -30]
+
+
+async def test_db_customer_balance_changes_go_through_the_ledger(client):
+    created = await client.post("/db/customer", json={
+        "username": "baru", "password": "p", "email": "baru@test", "notelp": "9", "saldo": 5000
+    })
+    assert created.status_code == 200
+    id_customer = created.json()["id_customer"]
+
+    updated = await client.put(f"/db/customer/{id_customer}", json={
+        "username": "baru", "password": "p", "email": "baru@test", "notelp": "9", "saldo": 3000
+    })
+    assert updated.json()["saldo"] == 3000
+
+    negative = await client.put(f"/db/customer/{id_customer}", json={
+        "username": "lain", "password": "p", "email": "baru@test", "notelp": "9", "saldo": -1
+    })
+    assert negative.status_code == 400
+
+    ledger = await _ledger(id_customer)
+    assert [(trx.jenis, trx.jumlah, trx.saldo_setelah) for trx in ledger] == [
+        (wallet_ledger.OPENING, 5000, 5000),
+        (wallet_ledger.ADJUSTMENT, -2000, 3000),
+    ]
+    async with database.SessionLocal() as db:
+        customer = await db.get(models.Customer, id_customer)
+    assert (customer.username, customer.saldo) == ("baru", 3000)